@@ -1,9 +1,52 @@
 #!/bin/bash
-/opt/netbox/venv/bin/python /opt/netbox/netbox/manage.py rqworker software_manager &
-/opt/netbox/venv/bin/python /opt/netbox/netbox/manage.py rqworker software_manager &
-/opt/netbox/venv/bin/python /opt/netbox/netbox/manage.py rqworker software_manager &
-/opt/netbox/venv/bin/python /opt/netbox/netbox/manage.py rqworker software_manager &
-/opt/netbox/venv/bin/python /opt/netbox/netbox/manage.py rqworker software_manager &
+# Queue names have to match UPGRADE_QUEUE/UPLOAD_QUEUE in configuration.py.
+UPGRADE_QUEUE=${UPGRADE_QUEUE:-software_manager}
+UPLOAD_QUEUE=${UPLOAD_QUEUE:-software_manager_upload}
+# Workers dedicated to upgrades (reloads inside MW), workers dedicated to uploads (image pre-staging)
+# and shared workers, which serve upgrades first and take uploads only when no upgrade is waiting.
+UPGRADE_WORKERS=${UPGRADE_WORKERS:-5}
+UPLOAD_WORKERS=${UPLOAD_WORKERS:-1}
+SHARED_WORKERS=${SHARED_WORKERS:-0}
+
+# upload tasks and image publishing would stay queued forever
+if [ "$UPLOAD_QUEUE" != "$UPGRADE_QUEUE" ] && [ $((UPLOAD_WORKERS + SHARED_WORKERS)) -eq 0 ]; then
+    echo "No workers for '$UPLOAD_QUEUE' queue: set UPLOAD_WORKERS or SHARED_WORKERS" >&2
+    exit 1
+fi
+
+for i in $(seq 1 $UPGRADE_WORKERS); do
+    /opt/netbox/venv/bin/python /opt/netbox/netbox/manage.py rqworker $UPGRADE_QUEUE &
+done
+
+if [ "$UPLOAD_QUEUE" != "$UPGRADE_QUEUE" ]; then
+    for i in $(seq 1 $UPLOAD_WORKERS); do
+        /opt/netbox/venv/bin/python /opt/netbox/netbox/manage.py rqworker $UPLOAD_QUEUE &
+    done
+    for i in $(seq 1 $SHARED_WORKERS); do
+        /opt/netbox/venv/bin/python /opt/netbox/netbox/manage.py rqworker $UPGRADE_QUEUE $UPLOAD_QUEUE &
+    done
+fi
+
+# Periodic maintenance commands, interval in seconds
+periodic() {
+    interval=$1
+    shift
+    while true; do
+        /opt/netbox/venv/bin/python /opt/netbox/netbox/manage.py "$@"
+        sleep $interval
+    done &
+}
+
+periodic ${RECONCILE_INTERVAL:-300} reconcile_tasks
+periodic ${SCRUB_INTERVAL:-3600} scrub_images
+periodic ${COMPLIANCE_INTERVAL:-3600} refresh_compliance
+periodic ${PURGE_INTERVAL:-86400} purge_tasks
+periodic ${COLLECT_INTERVAL:-86400} collect_versions
+
+# Boot events for tasks waiting after reload (BOOT_EVENTS in configuration.py)
+if [ "${EVENT_RECEIVER:-0}" = "1" ]; then
+    /opt/netbox/venv/bin/python /opt/netbox/netbox/manage.py event_receiver &
+fi
 
 /opt/netbox/venv/bin/python /opt/netbox/netbox/manage.py rqworker high default low
 exec "$@"
@@ -15,6 +15,10 @@ setup(
         "scrapli[paramiko]",
         "scrapli[textfsm]",
     ],
+    extras_require={
+        # hlapi.asyncio getCmd with synchronous UdpTransportTarget, renamed in pysnmp 6.2/7
+        "snmp": ["pysnmp>=4.4.12,<6.2"],
+    },
     packages=find_packages(),
     include_package_data=True,
     url="https://github.com/alsigna/netbox-software-manager",
@@ -13,5 +13,9 @@ class SoftwareManager(PluginConfig):
     base_url = "software-manager"
     caching_config = {}
 
+    def ready(self):
+        super().ready()
+        from . import signals  # noqa: F401
+
 
 config = SoftwareManager
@@ -36,7 +36,7 @@ from netbox.api.serializers import ValidatedModelSerializer
 from rest_framework import serializers
 
 # from netbox.api import ContentTypeField
-from ..models import GoldenImage, ScheduledTask, SoftwareImage
+from ..models import GoldenImage, ScheduledTask, SoftwareImage, SoftwareImageUpload
 
 # from django.contrib.contenttypes.models import ContentType
 
@@ -54,11 +54,42 @@ class SoftwareImageSerializer(ValidatedModelSerializer):
             "image",
             "md5sum",
             "md5sum_calculated",
+            "sha256sum",
+            "sha512sum",
+            "image_size",
+            "integrity_status",
+            "scrubbed_time",
             "version",
             "filename",
         ]
 
 
+class SoftwareImageImportSerializer(serializers.Serializer):
+    directory = serializers.CharField()
+    link = serializers.BooleanField(default=False)
+    trust_md5 = serializers.BooleanField(default=False)
+
+
+class SoftwareImageUploadSerializer(serializers.ModelSerializer):
+    offset = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = SoftwareImageUpload
+        fields = [
+            "upload_id",
+            "filename",
+            "version",
+            "md5sum",
+            "size",
+            "offset",
+            "received",
+            "created",
+            "last_updated",
+        ]
+        read_only_fields = ["upload_id", "received", "created", "last_updated"]
+        extra_kwargs = {"size": {"min_value": 1}}
+
+
 class GoldenImageSerializer(ValidatedModelSerializer):
     url = serializers.HyperlinkedIdentityField(view_name="plugins-api:software_manager-api:goldenimage-detail")
 
@@ -1,12 +1,13 @@
 from netbox.api.routers import NetBoxRouter
 
-from .views import GoldenImageViewSet, ScheduledTaskViewSet, SoftwareImageViewSet
+from .views import GoldenImageViewSet, ScheduledTaskViewSet, SoftwareImageUploadViewSet, SoftwareImageViewSet
 
 app_name = "software_manager"
 
 router = NetBoxRouter()
 
 router.register(r"software-image", SoftwareImageViewSet)
+router.register(r"software-image-upload", SoftwareImageUploadViewSet)
 router.register(r"golden-image", GoldenImageViewSet)
 router.register(r"scheduled-task", ScheduledTaskViewSet)
 
@@ -1,8 +1,23 @@
+from pathlib import Path
+
+from django_rq import get_queue
 from netbox.api.viewsets import NetBoxModelViewSet
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+from rest_framework.response import Response
 
 from ..filtersets import SoftwareImageFilterSet
-from ..models import GoldenImage, ScheduledTask, SoftwareImage
-from .serializers import GoldenImageSerializer, ScheduledTaskSerializer, SoftwareImageSerializer
+from ..importer import is_import_allowed
+from ..models import GoldenImage, ScheduledTask, SoftwareImage, SoftwareImageUpload
+from ..uploads import UploadError, abort_upload, create_upload, finalize_upload, write_chunk
+from .serializers import (
+    GoldenImageSerializer,
+    ScheduledTaskSerializer,
+    SoftwareImageImportSerializer,
+    SoftwareImageSerializer,
+    SoftwareImageUploadSerializer,
+)
 
 
 class SoftwareImageViewSet(NetBoxModelViewSet):
@@ -10,6 +25,116 @@ class SoftwareImageViewSet(NetBoxModelViewSet):
     serializer_class = SoftwareImageSerializer
     filterset_class = SoftwareImageFilterSet
 
+    @action(detail=False, methods=["post"], url_path="import")
+    def import_images(self, request):
+        serializer = SoftwareImageImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        directory = serializer.validated_data["directory"]
+        if not Path(directory).is_dir() or not is_import_allowed(directory):
+            return Response(
+                {"directory": f"'{directory}' is not a directory allowed for import (IMAGE_IMPORT_ROOTS)"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        # hashing of hundreds of images takes minutes, result is available in RQ job
+        job = get_queue("default").enqueue(
+            "software_manager.importer.import_images",
+            job_timeout=6 * 3600,
+            **serializer.validated_data,
+        )
+        return Response({"job_id": job.id}, status=status.HTTP_202_ACCEPTED)
+
+
+class CanUploadSoftwareImage(BasePermission):
+    def has_permission(self, request, view):
+        if not request.user.is_authenticated:
+            return False
+        token = request.auth
+        if request.method not in SAFE_METHODS and token is not None and not getattr(token, "write_enabled", True):
+            return False
+        return request.user.has_perm("software_manager.add_softwareimage")
+
+
+def _upload_headers(upload: SoftwareImageUpload) -> dict[str, str]:
+    return {
+        "Upload-Offset": str(upload.offset),
+        "Upload-Length": str(upload.size),
+        "Cache-Control": "no-store",
+    }
+
+
+def _upload_error(e: UploadError) -> Response:
+    return Response(
+        {"detail": e.message},
+        status=status.HTTP_409_CONFLICT if e.conflict else status.HTTP_400_BAD_REQUEST,
+    )
+
+
+# Resumable upload (tus-like):
+#   POST   software-image-upload/                     {"filename", "size", "version", "md5sum"}
+#   HEAD   software-image-upload/<upload_id>/         Upload-Offset: contiguous bytes received
+#   PATCH  software-image-upload/<upload_id>/         Upload-Offset: N, raw body is written at N
+#   POST   software-image-upload/<upload_id>/finalize/ -> SoftwareImage
+#   DELETE software-image-upload/<upload_id>/
+# Chunks can be sent in parallel at different offsets.
+class SoftwareImageUploadViewSet(viewsets.GenericViewSet):
+    queryset = SoftwareImageUpload.objects.all()
+    serializer_class = SoftwareImageUploadSerializer
+    permission_classes = [CanUploadSoftwareImage]
+    lookup_field = "upload_id"
+
+    def list(self, request):
+        serializer = self.get_serializer(self.get_queryset(), many=True)
+        return Response(serializer.data)
+
+    def create(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            upload = create_upload(**serializer.validated_data)
+        except UploadError as e:
+            return _upload_error(e)
+        return Response(
+            self.get_serializer(upload).data,
+            status=status.HTTP_201_CREATED,
+            headers=_upload_headers(upload),
+        )
+
+    def retrieve(self, request, upload_id=None):
+        upload = self.get_object()
+        return Response(self.get_serializer(upload).data, headers=_upload_headers(upload))
+
+    def partial_update(self, request, upload_id=None):
+        upload = self.get_object()
+        try:
+            offset = int(request.headers["Upload-Offset"])
+            length = int(request.headers["Content-Length"])
+        except (KeyError, ValueError):
+            return Response(
+                {"detail": "Upload-Offset and Content-Length headers are required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        # body is streamed to the file, request.data is never parsed
+        try:
+            upload = write_chunk(upload, offset, request.stream, length)
+        except UploadError as e:
+            return _upload_error(e)
+        return Response(status=status.HTTP_204_NO_CONTENT, headers=_upload_headers(upload))
+
+    def destroy(self, request, upload_id=None):
+        abort_upload(self.get_object())
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=["post"])
+    def finalize(self, request, upload_id=None):
+        try:
+            sw = finalize_upload(self.get_object())
+        except UploadError as e:
+            return _upload_error(e)
+        return Response(
+            SoftwareImageSerializer(sw, context={"request": request}).data,
+            status=status.HTTP_201_CREATED,
+        )
+
 
 class GoldenImageViewSet(NetBoxModelViewSet):
     queryset = GoldenImage.objects.all()
@@ -17,5 +142,5 @@ class GoldenImageViewSet(NetBoxModelViewSet):
 
 
 class ScheduledTaskViewSet(NetBoxModelViewSet):
-    queryset = ScheduledTask.objects.all()
+    queryset = ScheduledTask.objects.select_related("device").defer("log")
     serializer_class = ScheduledTaskSerializer
@@ -4,20 +4,24 @@ from utilities.choices import ChoiceSet
 class TaskTypeChoices(ChoiceSet):
     TYPE_UPLOAD = "upload"
     TYPE_UPGRADE = "upgrade"
+    TYPE_UPLOAD_UPGRADE = "upload-upgrade"
 
     CHOICES = (
         (TYPE_UPLOAD, "upload"),
         (TYPE_UPGRADE, "upgrade"),
+        (TYPE_UPLOAD_UPGRADE, "upload+upgrade"),
     )
 
 
 class TaskTransferMethod(ChoiceSet):
     METHOD_FTP = "ftp"
     METHOD_HTTP = "http"
+    METHOD_SCP = "scp"
 
     CHOICES = (
         (METHOD_FTP, "ftp"),
         (METHOD_HTTP, "http"),
+        (METHOD_SCP, "scp"),
     )
 
 
@@ -61,3 +65,43 @@ class TaskFailReasonChoices(ChoiceSet):
         (FAIL_UPGRADE, "fail-upgrade"),
         (FAIL_UPLOAD, "fail-upload"),
     )
+
+
+class ImageIntegrityChoices(ChoiceSet):
+    INTEGRITY_UNKNOWN = "unknown"
+    INTEGRITY_OK = "ok"
+    INTEGRITY_MISMATCH = "mismatch"
+    INTEGRITY_MISSING = "missing"
+
+    CHOICES = (
+        (INTEGRITY_UNKNOWN, "unknown"),
+        (INTEGRITY_OK, "ok"),
+        (INTEGRITY_MISMATCH, "mismatch"),
+        (INTEGRITY_MISSING, "missing"),
+    )
+
+
+class PublicationStatusChoices(ChoiceSet):
+    STATUS_PENDING = "pending"
+    STATUS_PUBLISHING = "publishing"
+    STATUS_PUBLISHED = "published"
+    STATUS_FAILED = "failed"
+
+    CHOICES = (
+        (STATUS_PENDING, "pending"),
+        (STATUS_PUBLISHING, "publishing"),
+        (STATUS_PUBLISHED, "published"),
+        (STATUS_FAILED, "failed"),
+    )
+
+
+class DeviceComplianceChoices(ChoiceSet):
+    COMPLIANT = "compliant"
+    NEEDS_UPGRADE = "needs-upgrade"
+    UNKNOWN = "unknown"
+
+    CHOICES = (
+        (COMPLIANT, "compliant"),
+        (NEEDS_UPGRADE, "needs upgrade"),
+        (UNKNOWN, "unknown"),
+    )
@@ -0,0 +1,168 @@
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import textfsm
+from dcim.choices import DeviceStatusChoices
+from dcim.models import Device
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import F, Func, JSONField, Q, TextField, Value
+from django.db.models.functions import Cast
+from scrapli.driver.core import IOSXEDriver
+from scrapli.helper import _textfsm_get_template
+
+from .compliance import record_versions
+from .context import release_db_connections
+from .snmp import poll_devices
+
+PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get("software_manager", dict())
+DEVICE_USERNAME = PLUGIN_SETTINGS.get("DEVICE_USERNAME", "")
+DEVICE_PASSWORD = PLUGIN_SETTINGS.get("DEVICE_PASSWORD", "")
+CF_NAME_SW_VERSION = PLUGIN_SETTINGS.get("CF_NAME_SW_VERSION", "")
+# Devices polled at the same time by collect_versions
+COLLECT_WORKERS = PLUGIN_SETTINGS.get("COLLECT_WORKERS", 50)
+# Timeout (seconds) of SSH connect and "show version" for one device
+COLLECT_TIMEOUT = PLUGIN_SETTINGS.get("COLLECT_TIMEOUT", 30)
+COLLECT_CHUNK_SIZE = 500
+
+RESULT_CHANGED = "changed"
+RESULT_UNCHANGED = "unchanged"
+RESULT_UNREACHABLE = "unreachable"
+RESULT_UNPARSABLE = "unparsable"
+
+_local = threading.local()
+
+
+# Template is read from ntc-templates once, every thread keeps its own compiled parser
+@lru_cache(maxsize=None)
+def _get_template() -> str:
+    template = _textfsm_get_template("cisco_iosxe", "show version")
+    if template is None:
+        raise RuntimeError("TextFSM template for 'show version' is not found")
+    with template:
+        return template.read()
+
+
+def parse_version(output: str) -> str:
+    fsm = getattr(_local, "fsm", None)
+    if fsm is None:
+        fsm = _local.fsm = textfsm.TextFSM(io.StringIO(_get_template()))
+    fsm.Reset()
+    rows = fsm.ParseTextToDicts(output)
+    return rows[0].get("VERSION", "") if rows else ""
+
+
+def get_collect_devices(
+    sites: list[int] | None = None,
+    device_types: list[int] | None = None,
+    roles: list[int] | None = None,
+):
+    devices = (
+        Device.objects.filter(status=DeviceStatusChoices.STATUS_ACTIVE)
+        .filter(Q(primary_ip4__isnull=False) | Q(primary_ip6__isnull=False))
+        .select_related("primary_ip4", "primary_ip6")
+        .order_by("pk")
+    )
+    if sites:
+        devices = devices.filter(site_id__in=sites)
+    if device_types:
+        devices = devices.filter(device_type_id__in=device_types)
+    if roles:
+        devices = devices.filter(device_role_id__in=roles)
+    return devices
+
+
+# Returns (failure, version or error message), failure is None if version was read
+def _read_version(host: str) -> tuple[str | None, str]:
+    cli = IOSXEDriver(
+        host=host,
+        auth_username=DEVICE_USERNAME,
+        auth_password=DEVICE_PASSWORD,
+        auth_strict_key=False,
+        port=22,
+        transport="paramiko",
+        timeout_socket=COLLECT_TIMEOUT,
+        timeout_transport=COLLECT_TIMEOUT,
+        timeout_ops=COLLECT_TIMEOUT,
+    )
+    try:
+        cli.open()
+        output = cli.send_command("show version")
+    except Exception as e:
+        # one device (auth, transport, paramiko errors) must not abort the fleet run
+        return RESULT_UNREACHABLE, f"{e.__class__.__name__}: {e}"
+    finally:
+        try:
+            cli.close()
+        except Exception:
+            pass
+    if output.failed:
+        return RESULT_UNREACHABLE, "show version failed"
+    try:
+        version = parse_version(output.result)
+    except Exception as e:
+        return RESULT_UNPARSABLE, f"{e.__class__.__name__}: {e}"
+    if not version:
+        return RESULT_UNPARSABLE, "no version in output"
+    return None, version
+
+
+# Reads "show version" from all selected devices in parallel and writes versions with bulk updates
+# (no Device.save() and change log per device). Returns counters and names of failed devices.
+def collect_versions(devices, dry_run: bool = False) -> dict:
+    if not CF_NAME_SW_VERSION:
+        raise RuntimeError("CF_NAME_SW_VERSION is not set")
+    devices = list(devices)
+    hosts = [str(device.primary_ip.address.ip) for device in devices]
+    # SSH sessions take minutes for big fleet, DB connection is not needed until results are written
+    release_db_connections()
+    # SNMP answers in milliseconds, SSH login is needed only for devices without SNMP response
+    results: dict[str, tuple[str | None, str]] = {}
+    for host, status in poll_devices(hosts).items():
+        if status is not None and status.version:
+            results[host] = (None, status.version)
+    ssh_hosts = [host for host in dict.fromkeys(hosts) if host not in results]
+    with ThreadPoolExecutor(max_workers=COLLECT_WORKERS) as pool:
+        results.update(zip(ssh_hosts, pool.map(_read_version, ssh_hosts)))
+
+    summary = {
+        "devices": len(devices),
+        RESULT_CHANGED: 0,
+        RESULT_UNCHANGED: 0,
+        RESULT_UNREACHABLE: [],
+        RESULT_UNPARSABLE: [],
+    }
+    changed: dict[str, list[int]] = {}
+    versions = {}
+    for device, host in zip(devices, hosts):
+        failure, value = results[host]
+        if failure is not None:
+            summary[failure].append(f"{device}: {value}")
+            continue
+        versions[device] = value
+        if device.custom_field_data.get(CF_NAME_SW_VERSION) == value:
+            summary[RESULT_UNCHANGED] += 1
+            continue
+        summary[RESULT_CHANGED] += 1
+        changed.setdefault(value, []).append(device.pk)
+
+    if not dry_run:
+        for version, pks in changed.items():
+            _set_version(pks, version)
+        record_versions(versions)
+    return summary
+
+
+# Only version key is written (jsonb_set), other custom fields changed during polling are kept
+def _set_version(pks: list[int], version: str) -> None:
+    new_data = Func(
+        F("custom_field_data"),
+        Value([CF_NAME_SW_VERSION], output_field=ArrayField(TextField())),
+        Cast(Value(version, output_field=JSONField()), JSONField()),
+        function="jsonb_set",
+        output_field=JSONField(),
+    )
+    for i in range(0, len(pks), COLLECT_CHUNK_SIZE):
+        Device.objects.filter(pk__in=pks[i : i + COLLECT_CHUNK_SIZE]).update(custom_field_data=new_data)
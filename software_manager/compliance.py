@@ -0,0 +1,104 @@
+from datetime import datetime
+from typing import Iterable
+
+import pytz
+from dcim.models import Device
+from django.conf import settings
+
+from .models import DeviceCompliance, GoldenImage
+
+PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get("software_manager", dict())
+CF_NAME_SW_VERSION = PLUGIN_SETTINGS.get("CF_NAME_SW_VERSION", "")
+COMPLIANCE_CHUNK_SIZE = 2000
+
+# refresher does not touch last_seen, it is set only when version is read from the device
+REFRESH_FIELDS = ["device_type", "current_version", "target_version", "compliant", "last_updated"]
+
+
+def is_compliant(current_version: str, target_version: str) -> bool:
+    return bool(target_version) and current_version.lower() == target_version.lower()
+
+
+# Rebuilds compliance rows from custom field and golden images with upserts in chunks. Rows of
+# deleted devices are removed by CASCADE.
+def refresh_compliance(device_types: Iterable[int] | None = None) -> dict[str, int]:
+    targets = dict(
+        GoldenImage.objects.filter(sw__isnull=False).values_list("pid_id", "sw__version"),
+    )
+    devices = Device.objects.order_by("pk")
+    if device_types is not None:
+        devices = devices.filter(device_type_id__in=list(device_types))
+    rows = devices.values_list("pk", "device_type_id", f"custom_field_data__{CF_NAME_SW_VERSION}")
+
+    now = datetime.now().astimezone(pytz.utc)
+    counters = {"devices": 0, "compliant": 0}
+    chunk: list[DeviceCompliance] = []
+    for device_id, device_type_id, current_version in rows.iterator(chunk_size=COMPLIANCE_CHUNK_SIZE):
+        current_version = str(current_version or "")[:32]
+        target_version = targets.get(device_type_id) or ""
+        compliant = is_compliant(current_version, target_version)
+        counters["devices"] += 1
+        counters["compliant"] += compliant
+        chunk.append(
+            DeviceCompliance(
+                device_id=device_id,
+                device_type_id=device_type_id,
+                current_version=current_version,
+                target_version=target_version,
+                compliant=compliant,
+                last_updated=now,
+            )
+        )
+        if len(chunk) >= COMPLIANCE_CHUNK_SIZE:
+            _upsert(chunk)
+            chunk = []
+    _upsert(chunk)
+    return counters
+
+
+def _upsert(rows: list[DeviceCompliance], update_fields: list[str] = REFRESH_FIELDS) -> None:
+    if not rows:
+        return
+    DeviceCompliance.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["device"],
+        update_fields=update_fields,
+    )
+
+
+# Versions read from devices by collector: {device: version}, last_seen is updated as well
+def record_versions(versions: dict[Device, str]) -> None:
+    targets = dict(
+        GoldenImage.objects.filter(sw__isnull=False).values_list("pid_id", "sw__version"),
+    )
+    now = datetime.now().replace(microsecond=0).astimezone(pytz.utc)
+    rows = []
+    for device, current_version in versions.items():
+        target_version = targets.get(device.device_type_id) or ""
+        rows.append(
+            DeviceCompliance(
+                device_id=device.pk,
+                device_type_id=device.device_type_id,
+                current_version=current_version[:32],
+                target_version=target_version,
+                compliant=is_compliant(current_version, target_version),
+                last_seen=now,
+                last_updated=now,
+            )
+        )
+    for i in range(0, len(rows), COMPLIANCE_CHUNK_SIZE):
+        _upsert(rows[i : i + COMPLIANCE_CHUNK_SIZE], REFRESH_FIELDS + ["last_seen"])
+
+
+def update_device_compliance(device: Device, current_version: str, target_version: str) -> None:
+    DeviceCompliance.objects.update_or_create(
+        device=device,
+        defaults={
+            "device_type_id": device.device_type_id,
+            "current_version": current_version[:32],
+            "target_version": target_version,
+            "compliant": is_compliant(current_version, target_version),
+            "last_seen": datetime.now().replace(microsecond=0).astimezone(pytz.utc),
+        },
+    )
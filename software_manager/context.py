@@ -0,0 +1,67 @@
+from dataclasses import dataclass
+
+from dcim.models import Device, DeviceType
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import connections
+
+from .models import GoldenImage, ScheduledTask, SoftwareImage
+
+# everything executor needs about the device and its golden image, loaded with the task in one query
+TASK_CONTEXT_RELATED = (
+    "device__primary_ip4",
+    "device__primary_ip6",
+    "device__site",
+    "device__device_type__golden_image__sw",
+)
+
+
+@dataclass(frozen=True)
+class TaskContext:
+    device: Device | None = None
+    host: str | None = None
+    device_type: DeviceType | None = None
+    golden_image: GoldenImage | None = None
+    sw: SoftwareImage | None = None
+    image_size: int | None = None
+    md5sum: str = ""
+    target_version: str = ""
+
+
+def load_task(task_id: int) -> ScheduledTask:
+    return ScheduledTask.objects.select_related(*TASK_CONTEXT_RELATED).get(pk=task_id)
+
+
+def build_task_context(task: ScheduledTask) -> TaskContext:
+    device = task.device
+    if device is None:
+        return TaskContext()
+    ip = device.primary_ip
+    try:
+        golden_image = device.device_type.golden_image
+    except ObjectDoesNotExist:
+        golden_image = None
+    sw = golden_image.sw if golden_image is not None else None
+    image_size = None
+    if sw is not None and sw.image_exists:
+        image_size = sw.image_size
+        if image_size is None:
+            try:
+                image_size = sw.image.size
+            except OSError:
+                pass
+    return TaskContext(
+        device=device,
+        host=str(ip.address.ip) if ip is not None else None,
+        device_type=device.device_type,
+        golden_image=golden_image,
+        sw=sw,
+        image_size=image_size,
+        md5sum=sw.md5sum if sw is not None else "",
+        target_version=sw.version if sw is not None else "",
+    )
+
+
+# Device operations (copy, verify, reload wait) take up to hours, an idle DB connection held for that
+# time exhausts PgBouncer/Postgres slots when many workers run. Django reconnects on the next query.
+def release_db_connections() -> None:
+    connections.close_all()
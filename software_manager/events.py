@@ -0,0 +1,112 @@
+import asyncio
+import ipaddress
+import json
+import logging
+import time
+
+from django.conf import settings
+
+from .queues import get_connection
+
+PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get("software_manager", dict())
+# Tasks wait for boot event from event_receiver after reload instead of blind TCP polling
+BOOT_EVENTS = PLUGIN_SETTINGS.get("BOOT_EVENTS", False)
+# Task log reports slow boot if there is no boot event N seconds after reload
+BOOT_EVENT_TIMEOUT = PLUGIN_SETTINGS.get("BOOT_EVENT_TIMEOUT", 300)
+SYSLOG_PORT = PLUGIN_SETTINGS.get("SYSLOG_PORT", 514)
+TRAP_PORT = PLUGIN_SETTINGS.get("TRAP_PORT", 162)
+BOOT_EVENT_TTL = 3600
+
+SYSLOG_RESTART = b"%SYS-5-RESTART"
+# snmpTrapOID.0 value of SNMPv2 coldStart (1.3.6.1.6.3.1.1.5.1) and warmStart (...5.2) traps, BER encoded
+TRAP_OIDS = {
+    b"\x06\x09\x2b\x06\x01\x06\x03\x01\x01\x05\x01": "coldStart",
+    b"\x06\x09\x2b\x06\x01\x06\x03\x01\x01\x05\x02": "warmStart",
+}
+
+log = logging.getLogger("event_receiver")
+
+
+def _key(host: str) -> str:
+    return f"software_manager:boot:{ipaddress.ip_address(host)}"
+
+
+# Event is kept in a key as well, so task which subscribes after device has booted still gets it
+def publish_boot(host: str, event: str) -> None:
+    message = json.dumps({"host": host, "event": event, "time": time.time()})
+    connection = get_connection()
+    connection.set(_key(host), message, ex=BOOT_EVENT_TTL)
+    connection.publish(_key(host), message)
+
+
+# Returns boot event of the host received after "since" (unix time), None on timeout
+def wait_for_boot(host: str, since: float, timeout: int = BOOT_EVENT_TIMEOUT) -> dict | None:
+    connection = get_connection()
+    pubsub = connection.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(_key(host))
+    try:
+        if (cached := connection.get(_key(host))) is not None and (event := json.loads(cached))["time"] >= since:
+            return event
+        deadline = time.monotonic() + timeout
+        while (left := deadline - time.monotonic()) > 0:
+            message = pubsub.get_message(timeout=min(left, 30))
+            if message is None or message["type"] != "message":
+                continue
+            if (event := json.loads(message["data"]))["time"] >= since:
+                return event
+        return None
+    finally:
+        pubsub.close()
+
+
+def match_syslog(data: bytes) -> str | None:
+    return "%SYS-5-RESTART" if SYSLOG_RESTART in data else None
+
+
+# Traps are matched by encoded OID without full BER decoding, pysnmp is not required
+def match_trap(data: bytes) -> str | None:
+    for oid, name in TRAP_OIDS.items():
+        if oid in data:
+            return name
+    return None
+
+
+class _DatagramReceiver(asyncio.DatagramProtocol):
+    def __init__(self, matcher) -> None:
+        self.matcher = matcher
+
+    def datagram_received(self, data: bytes, addr: tuple) -> None:
+        if (event := self.matcher(data)) is not None:
+            _publish(addr[0], event)
+
+
+def _publish(host: str, event: str) -> None:
+    try:
+        publish_boot(host, event)
+        log.info(f"Boot event '{event}' from {host}")
+    except Exception as e:
+        log.error(f"Can not publish boot event from {host}: {e.__class__.__name__}: {e}")
+
+
+async def _handle_syslog_tcp(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    host = writer.get_extra_info("peername")[0]
+    try:
+        while line := await reader.readline():
+            if (event := match_syslog(line)) is not None:
+                _publish(host, event)
+    except (ValueError, ConnectionError):
+        # line longer than stream limit or connection reset, device reconnects
+        pass
+    finally:
+        writer.close()
+
+
+# Syslog over UDP and TCP, SNMP traps over UDP. Source address of the packet has to be device primary
+# IP ("logging source-interface" / "snmp-server trap-source" on the device).
+async def run_receiver(syslog_port: int = SYSLOG_PORT, trap_port: int = TRAP_PORT) -> None:
+    loop = asyncio.get_running_loop()
+    await loop.create_datagram_endpoint(lambda: _DatagramReceiver(match_syslog), local_addr=("0.0.0.0", syslog_port))
+    await loop.create_datagram_endpoint(lambda: _DatagramReceiver(match_trap), local_addr=("0.0.0.0", trap_port))
+    server = await asyncio.start_server(_handle_syslog_tcp, "0.0.0.0", syslog_port)
+    async with server:
+        await server.serve_forever()
@@ -1,8 +1,9 @@
-from dcim.models import DeviceType
+from dcim.models import Device, DeviceRole, DeviceType, Site
 from django.db.models import Q
-from django_filters import DateTimeFromToRangeFilter
+from django_filters import BooleanFilter, DateTimeFromToRangeFilter, ModelMultipleChoiceFilter, MultipleChoiceFilter
 from netbox.filtersets import NetBoxModelFilterSet
 
+from .choices import DeviceComplianceChoices
 from .models import ScheduledTask, SoftwareImage
 
 
@@ -53,6 +54,67 @@ class GoldenImageFilterSet(NetBoxModelFilterSet):
         return queryset.filter(qs_filter)
 
 
+class UpgradeDeviceFilterSet(NetBoxModelFilterSet):
+    site_id = ModelMultipleChoiceFilter(
+        queryset=Site.objects.all(),
+        label="Site (ID)",
+    )
+    role_id = ModelMultipleChoiceFilter(
+        field_name="device_role",
+        queryset=DeviceRole.objects.all(),
+        label="Role (ID)",
+    )
+    device_type_id = ModelMultipleChoiceFilter(
+        queryset=DeviceType.objects.all(),
+        label="Device type (ID)",
+    )
+    compliance = MultipleChoiceFilter(
+        choices=DeviceComplianceChoices,
+        method="filter_compliance",
+    )
+    has_golden_image = BooleanFilter(
+        method="filter_has_golden_image",
+    )
+
+    class Meta:
+        model = Device
+        fields = (
+            "id",
+            "name",
+            "site_id",
+            "role_id",
+            "device_type_id",
+        )
+
+    def search(self, queryset, name, value):
+        if not value.strip():
+            return queryset
+        qs_filter = (
+            Q(name__icontains=value)
+            | Q(serial__icontains=value.strip())
+            | Q(compliance__current_version__icontains=value)
+        )
+        return queryset.filter(qs_filter)
+
+    # served by DeviceCompliance indexes, not by custom_field_data JSON
+    def filter_compliance(self, queryset, name, value):
+        if not value:
+            return queryset
+        qs_filter = Q()
+        if DeviceComplianceChoices.COMPLIANT in value:
+            qs_filter |= Q(compliance__compliant=True)
+        if DeviceComplianceChoices.NEEDS_UPGRADE in value:
+            qs_filter |= Q(compliance__compliant=False) & ~Q(compliance__target_version="")
+        if DeviceComplianceChoices.UNKNOWN in value:
+            qs_filter |= Q(compliance__isnull=True)
+        return queryset.filter(qs_filter)
+
+    def filter_has_golden_image(self, queryset, name, value):
+        if value is None:
+            return queryset
+        return queryset.filter(device_type__golden_image__sw__isnull=not value)
+
+
 class ScheduledTaskFilterSet(NetBoxModelFilterSet):
     scheduled_time = DateTimeFromToRangeFilter()
     start_time = DateTimeFromToRangeFilter()
@@ -1,6 +1,4 @@
-from pathlib import Path
-
-from dcim.models import Device, DeviceType, Manufacturer
+from dcim.models import Device, DeviceRole, DeviceType, Manufacturer, Site
 from django import forms
 from django.conf import settings
 from netbox.forms import NetBoxModelFilterSetForm, NetBoxModelForm
@@ -15,8 +13,9 @@ from utilities.forms import (
     TagFilterField,
 )
 
-from .choices import TaskStatusChoices, TaskTransferMethod, TaskTypeChoices
+from .choices import DeviceComplianceChoices, TaskStatusChoices, TaskTransferMethod, TaskTypeChoices
 from .models import GoldenImage, ScheduledTask, SoftwareImage
+from .storage import get_image_storage
 
 PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get("software_manager", dict())
 CF_NAME_SW_VERSION = PLUGIN_SETTINGS.get("CF_NAME_SW_VERSION", "")
@@ -88,7 +87,7 @@ class SoftwareImageEditForm(NetBoxModelForm):
             )
 
         # if trying to upload image, but this file already exists on a disk
-        if image and Path(settings.MEDIA_ROOT, IMAGE_FOLDER, image.name).is_file():
+        if image and get_image_storage().exists(f"{IMAGE_FOLDER}/{image.name}"):
             raise forms.ValidationError(
                 {"image": f"File '{image.name}' already exists. Contact with NetBox admins."},
             )
@@ -164,6 +163,42 @@ class GoldenImageFilterForm(NetBoxModelFilterSetForm):
         )
 
 
+class UpgradeDeviceFilterForm(NetBoxModelFilterSetForm):
+    site_id = DynamicModelMultipleChoiceField(
+        queryset=Site.objects.all(),
+        required=False,
+        label="Site",
+    )
+    role_id = DynamicModelMultipleChoiceField(
+        queryset=DeviceRole.objects.all(),
+        required=False,
+        label="Role",
+    )
+    device_type_id = DynamicModelMultipleChoiceField(
+        queryset=DeviceType.objects.all(),
+        required=False,
+        label="Device Type",
+    )
+    compliance = MultipleChoiceField(
+        choices=DeviceComplianceChoices,
+        required=False,
+        label="Compliance",
+    )
+    has_golden_image = forms.NullBooleanField(
+        required=False,
+        label="Has Golden Image",
+        widget=StaticSelect(choices=BOOLEAN_WITH_BLANK_CHOICES),
+    )
+
+    model = Device
+    tag = TagFilterField(Device)
+    fieldsets = (
+        (None, ("q", "tag")),
+        ("Device", ("site_id", "role_id", "device_type_id")),
+        ("Software", ("compliance", "has_golden_image")),
+    )
+
+
 class GoldenImageAddForm(BootstrapMixin, forms.ModelForm):
     device_pid = forms.CharField(
         required=True,
@@ -0,0 +1,83 @@
+import hashlib
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, TemporaryFileUploadHandler
+
+PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get("software_manager", dict())
+IMAGE_FOLDER = PLUGIN_SETTINGS.get("IMAGE_FOLDER", "")
+# MD5 is always calculated, devices verify images with "verify /md5". Additional digests: sha256, sha512.
+IMAGE_HASH_ALGORITHMS = PLUGIN_SETTINGS.get("IMAGE_HASH_ALGORITHMS", ["sha256"])
+# content-addressed layout names blobs by sha256, so it is required there
+IMAGE_STORAGE_LAYOUT = PLUGIN_SETTINGS.get("IMAGE_STORAGE_LAYOUT", "flat")
+HASH_BUFFER_SIZE = 8 * 1024 * 1024
+
+
+def get_hashers() -> dict:
+    names = ["md5"] + [name for name in IMAGE_HASH_ALGORITHMS if name != "md5"]
+    if IMAGE_STORAGE_LAYOUT == "cas" and "sha256" not in names:
+        names.append("sha256")
+    return {name: hashlib.new(name) for name in names}
+
+
+def hash_file(path: str | Path, buffer_size: int = HASH_BUFFER_SIZE) -> dict[str, str]:
+    hashers = get_hashers()
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while size := f.readinto(buffer):
+            for hasher in hashers.values():
+                hasher.update(view[:size])
+    return {name: hasher.hexdigest() for name, hasher in hashers.items()}
+
+
+# image is read once for copy and hashes
+def copy_and_hash(source: str | Path, destination: str | Path, buffer_size: int = HASH_BUFFER_SIZE) -> dict[str, str]:
+    hashers = get_hashers()
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(source, "rb", buffering=0) as src, open(destination, "wb") as dst:
+        while size := src.readinto(buffer):
+            for hasher in hashers.values():
+                hasher.update(view[:size])
+            dst.write(view[:size])
+    return {name: hasher.hexdigest() for name, hasher in hashers.items()}
+
+
+# for files which are not on a local disk (object storage)
+def hash_fileobj(f, buffer_size: int = HASH_BUFFER_SIZE) -> dict[str, str]:
+    hashers = get_hashers()
+    while data := f.read(buffer_size):
+        for hasher in hashers.values():
+            hasher.update(data)
+    return {name: hasher.hexdigest() for name, hasher in hashers.items()}
+
+
+class HashedTemporaryUploadedFile(TemporaryUploadedFile):
+    def __init__(self, name, content_type, size, charset, content_type_extra=None):
+        # Temporary file is created in the image folder, so storage moves it to the final location
+        # with rename instead of another full copy.
+        upload_dir = Path(settings.MEDIA_ROOT, IMAGE_FOLDER)
+        if not upload_dir.is_dir():
+            upload_dir = settings.FILE_UPLOAD_TEMP_DIR
+        file = tempfile.NamedTemporaryFile(prefix=".upload-", suffix=".part", dir=upload_dir)
+        UploadedFile.__init__(self, file, name, content_type, size, charset, content_type_extra)
+        self.hashes: dict[str, str] = {}
+
+
+class HashingFileUploadHandler(TemporaryFileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        FileUploadHandler.new_file(self, *args, **kwargs)
+        self.file = HashedTemporaryUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+        self.hashers = get_hashers()
+
+    def receive_data_chunk(self, raw_data, start):
+        for hasher in self.hashers.values():
+            hasher.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.hashes = {name: hasher.hexdigest() for name, hasher in self.hashers.items()}
+        return super().file_complete(file_size)
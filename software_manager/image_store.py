@@ -0,0 +1,64 @@
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import ImageBlob, SoftwareImage
+from .storage import is_local_storage
+
+PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get("software_manager", dict())
+IMAGE_FOLDER = PLUGIN_SETTINGS.get("IMAGE_FOLDER", "")
+# "flat": IMAGE_FOLDER/<filename>, "cas": content is stored once as IMAGE_FOLDER/.blobs/<sha256>, and
+# IMAGE_FOLDER/<filename> is a hard-link alias to it, so FTP/HTTP servers still serve files by name.
+IMAGE_STORAGE_LAYOUT = PLUGIN_SETTINGS.get("IMAGE_STORAGE_LAYOUT", "flat")
+BLOB_FOLDER = ".blobs"
+
+
+def is_cas_enabled() -> bool:
+    return IMAGE_STORAGE_LAYOUT == "cas"
+
+
+def get_blob_path(sha256: str) -> Path:
+    return Path(settings.MEDIA_ROOT, IMAGE_FOLDER, BLOB_FOLDER, sha256[:2], sha256)
+
+
+# Content is matched by SHA-256, so a known image uploaded or imported under another name becomes an alias
+def attach_blob(sw: SoftwareImage) -> None:
+    # hard links need local filesystem, object storage keeps plain names
+    if not is_cas_enabled() or not is_local_storage() or not sw.image_exists or not sw.sha256sum or sw.blob_id is not None:
+        return
+    alias = Path(sw.image.path)
+    blob_path = get_blob_path(sw.sha256sum)
+    with transaction.atomic():
+        blob, _ = ImageBlob.objects.select_for_update().get_or_create(
+            sha256=sw.sha256sum,
+            defaults={"size": alias.stat().st_size},
+        )
+        if not blob_path.exists():
+            blob_path.parent.mkdir(parents=True, exist_ok=True)
+            os.link(alias, blob_path)
+        elif not alias.samefile(blob_path):
+            # the same content is already stored, uploaded copy is replaced by alias to it
+            tmp = alias.with_name(f".{alias.name}.link")
+            os.link(blob_path, tmp)
+            os.replace(tmp, alias)
+        ImageBlob.objects.filter(pk=blob.pk).update(refcount=F("refcount") + 1)
+    sw.blob = blob
+
+
+def release_blob(sw: SoftwareImage) -> None:
+    if sw.blob_id is None:
+        return
+    with transaction.atomic():
+        blob = ImageBlob.objects.select_for_update().get(pk=sw.blob_id)
+        blob.refcount -= 1
+        if blob.refcount > 0:
+            blob.save(update_fields=["refcount"])
+        else:
+            get_blob_path(blob.sha256).unlink(missing_ok=True)
+            # SoftwareImage.blob is PROTECT, reference is removed before the last blob is deleted
+            SoftwareImage.objects.filter(pk=sw.pk).update(blob=None)
+            blob.delete()
+    sw.blob = None
@@ -0,0 +1,158 @@
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+
+from .choices import ImageIntegrityChoices
+from .hashing import copy_and_hash, hash_file
+from .image_store import attach_blob
+from .models import SoftwareImage
+from .storage import get_image_storage, is_local_storage
+
+PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get("software_manager", dict())
+IMAGE_FOLDER = PLUGIN_SETTINGS.get("IMAGE_FOLDER", "")
+# (regex, template) pairs, the first matched pattern gives version. Template is formatted with named groups.
+IMAGE_VERSION_PATTERNS = PLUGIN_SETTINGS.get(
+    "IMAGE_VERSION_PATTERNS",
+    [
+        # IOS-XE: cat9k_iosxe.17.03.05.SPA.bin -> 17.03.05
+        (r"\.(?P<version>\d+\.\d+\.\d+[a-z]?)\.", "{version}"),
+        # IOS: c2960x-universalk9-mz.152-7.E4.bin -> 15.2(7)E4
+        (r"\.(?P<major>\d{2})(?P<minor>\d)-(?P<release>\d+)\.(?P<train>[A-Z]+\d*[a-z]?)\.bin$", "{major}.{minor}({release}){train}"),
+    ],
+)
+# Directories which can be imported via API
+IMAGE_IMPORT_ROOTS = PLUGIN_SETTINGS.get("IMAGE_IMPORT_ROOTS", [str(Path(settings.MEDIA_ROOT, IMAGE_FOLDER))])
+
+
+def extract_version(filename: str, patterns: list | None = None) -> str:
+    for pattern, template in patterns or IMAGE_VERSION_PATTERNS:
+        if match := re.search(pattern, filename):
+            return template.format(**match.groupdict())[:32]
+    return ""
+
+
+def is_import_allowed(directory: str | Path) -> bool:
+    directory = Path(directory).resolve()
+    return any(directory.is_relative_to(Path(root).resolve()) for root in IMAGE_IMPORT_ROOTS)
+
+
+# Runs in a pool process: places file into the image folder and hashes it. Returns (hashes, stat, error),
+# error is "conflict" if a different file with the same name is in the image folder.
+def _stage_image(source: Path, destination: Path, link: bool) -> tuple[dict[str, str] | None, os.stat_result | None, str]:
+    try:
+        if destination.exists():
+            hashes = hash_file(destination)
+            # identical file is left by interrupted import, it is registered as is
+            if not destination.samefile(source) and hashes != hash_file(source):
+                return None, None, "conflict"
+            return hashes, destination.stat(), ""
+        if link:
+            os.link(source, destination)
+            return hash_file(destination), destination.stat(), ""
+        # partial copy never appears under the final name
+        part = destination.with_name(f".{destination.name}.import")
+        try:
+            hashes = copy_and_hash(source, part)
+            shutil.copystat(source, part)
+            os.replace(part, destination)
+        finally:
+            part.unlink(missing_ok=True)
+        return hashes, destination.stat(), ""
+    except Exception as e:
+        return None, None, f"{e.__class__.__name__}: {e}"
+
+
+def _hash_source(source: Path) -> tuple[dict[str, str] | None, None, str]:
+    try:
+        return hash_file(source), None, ""
+    except Exception as e:
+        return None, None, f"{e.__class__.__name__}: {e}"
+
+
+# Registers all .bin files from directory. Files outside of the image folder are copied (or hard-linked)
+# into it, files are hashed in parallel and SoftwareImage records are created in bulk.
+def import_images(
+    directory: str,
+    link: bool = False,
+    patterns: list | None = None,
+    workers: int | None = None,
+    trust_md5: bool = False,
+) -> dict[str, list[str]]:
+    image_dir = Path(settings.MEDIA_ROOT, IMAGE_FOLDER)
+    storage = get_image_storage()
+    local = is_local_storage()
+    files = sorted(p for p in Path(directory).iterdir() if p.is_file() and p.suffix.lower() == ".bin")
+    existing = set(
+        SoftwareImage.objects.filter(filename__in=[p.name for p in files]).values_list("filename", flat=True)
+    )
+
+    summary: dict[str, list[str]] = {"imported": [], "exists": [], "no_version": [], "conflict": [], "failed": []}
+    staged = []
+    for path in files:
+        if path.name in existing:
+            summary["exists"].append(path.name)
+            continue
+        version = extract_version(path.name, patterns)
+        if not version:
+            summary["no_version"].append(path.name)
+            continue
+        destination = image_dir / path.name
+        # local files are compared by content in _stage_image
+        if not local and storage.exists(f"{IMAGE_FOLDER}/{path.name}"):
+            summary["conflict"].append(path.name)
+            continue
+        staged.append((path, destination, version))
+
+    images = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        if local:
+            results = pool.map(_stage_image, [s for s, _, _ in staged], [d for _, d, _ in staged], [link] * len(staged))
+        else:
+            results = pool.map(_hash_source, [s for s, _, _ in staged])
+        # one failed file does not abort the import, it is reported and can be imported again
+        for (source, destination, version), (hashes, stat, error) in zip(staged, results):
+            if error == "conflict":
+                summary["conflict"].append(destination.name)
+                continue
+            if error:
+                summary["failed"].append(f"{destination.name}: {error}")
+                continue
+            if not local:
+                # object storage backend uploads large files in parts
+                try:
+                    with open(source, "rb") as f:
+                        storage.save(f"{IMAGE_FOLDER}/{destination.name}", File(f))
+                except Exception as e:
+                    summary["failed"].append(f"{destination.name}: {e.__class__.__name__}: {e}")
+                    continue
+            sw = SoftwareImage(
+                image=f"{IMAGE_FOLDER}/{destination.name}",
+                filename=destination.name,
+                version=version,
+                md5sum=hashes["md5"] if trust_md5 else "",
+                integrity_status=ImageIntegrityChoices.INTEGRITY_OK,
+            )
+            sw._set_hashes(hashes)
+            sw._set_fingerprint(stat)
+            if not local:
+                sw.image_size = source.stat().st_size
+            images.append(sw)
+            summary["imported"].append(destination.name)
+
+    # bulk_create does not call save(), files were already hashed above. Blob refcounts are incremented
+    # in the same transaction, so they are rolled back if records are not created.
+    with transaction.atomic():
+        for sw in images:
+            if sw.blob_id is None and sw.sha256sum:
+                attach_blob(sw)
+                if sw.blob_id is not None:
+                    # alias may have been re-linked to already stored blob
+                    sw._set_fingerprint(sw._stat_image())
+        SoftwareImage.objects.bulk_create(images, batch_size=500)
+    return summary
@@ -0,0 +1,73 @@
+import threading
+
+from django.conf import settings
+
+from .queues import get_connection
+
+PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get("software_manager", dict())
+DEVICE_LOCK_TTL = PLUGIN_SETTINGS.get("DEVICE_LOCK_TTL", 300)
+
+# Refresh/release only if the lease is still owned by us, otherwise a lease which expired and was
+# taken by another worker could be removed.
+LUA_REFRESH = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("expire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+LUA_RELEASE = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class DeviceLease:
+    def __init__(self, device_pk: int, owner: str, ttl: int = DEVICE_LOCK_TTL) -> None:
+        self.key = f"software_manager:device-lock:{device_pk}"
+        self.owner = owner
+        self.ttl = int(ttl)
+        self.connection = get_connection()
+        self.acquired = False
+        self.lost = False
+        self._stop = threading.Event()
+        self._heartbeat: threading.Thread | None = None
+
+    @property
+    def holder(self) -> str | None:
+        value = self.connection.get(self.key)
+        if value is None:
+            return None
+        return value.decode() if isinstance(value, bytes) else value
+
+    def acquire(self) -> bool:
+        if not self.connection.set(self.key, self.owner, nx=True, ex=self.ttl):
+            return False
+        self.acquired = True
+        # Device operations (copy/verify/reload) block for much longer than TTL, lease is refreshed from
+        # background thread. If worker dies, lease expires after TTL.
+        self._heartbeat = threading.Thread(target=self._refresh, name=f"lease-{self.key}", daemon=True)
+        self._heartbeat.start()
+        return True
+
+    def _refresh(self) -> None:
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                if not self.connection.eval(LUA_REFRESH, 1, self.key, self.owner, self.ttl):
+                    self.lost = True
+                    return
+            except Exception:
+                # Redis blip, next attempt is still inside TTL
+                pass
+
+    def release(self) -> None:
+        if not self.acquired:
+            return
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join(timeout=5)
+        try:
+            self.connection.eval(LUA_RELEASE, 1, self.key, self.owner)
+        finally:
+            self.acquired = False
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from ...collector import RESULT_UNPARSABLE, RESULT_UNREACHABLE, collect_versions, get_collect_devices
+
+
+class Command(BaseCommand):
+    help = "Read software version from devices (show version) and update custom field and compliance"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--site", type=int, action="append", dest="sites", help="Site ID")
+        parser.add_argument("--device-type", type=int, action="append", dest="device_types", help="Device type ID")
+        parser.add_argument("--role", type=int, action="append", dest="roles", help="Device role ID")
+        parser.add_argument("--dry-run", action="store_true", help="Poll devices, but do not save versions")
+
+    def handle(self, *args, **options):
+        devices = get_collect_devices(options["sites"], options["device_types"], options["roles"])
+        summary = collect_versions(devices, dry_run=options["dry_run"])
+        for failure in (RESULT_UNREACHABLE, RESULT_UNPARSABLE):
+            for line in summary[failure]:
+                self.stdout.write(f"{failure}: {line}")
+        self.stdout.write(
+            f"Devices: {summary['devices']}, changed: {summary['changed']}, unchanged: {summary['unchanged']}, "
+            f"unreachable: {len(summary[RESULT_UNREACHABLE])}, unparsable: {len(summary[RESULT_UNPARSABLE])}"
+        )
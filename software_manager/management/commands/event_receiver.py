@@ -0,0 +1,17 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from ...events import SYSLOG_PORT, TRAP_PORT, run_receiver
+
+
+class Command(BaseCommand):
+    help = "Receive syslog and SNMP traps, publish device boot events (%SYS-5-RESTART, coldStart) for running tasks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--syslog-port", type=int, default=SYSLOG_PORT, help="Syslog UDP/TCP port")
+        parser.add_argument("--trap-port", type=int, default=TRAP_PORT, help="SNMP trap UDP port")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Listening for syslog on {options['syslog_port']}, traps on {options['trap_port']}")
+        asyncio.run(run_receiver(options["syslog_port"], options["trap_port"]))
@@ -0,0 +1,63 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...importer import import_images
+
+
+class Command(BaseCommand):
+    help = "Register all .bin images from directory in Software Repository"
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory", help="Directory with .bin files")
+        parser.add_argument(
+            "--link",
+            action="store_true",
+            help="Hard-link files into image folder instead of copy (same filesystem only)",
+        )
+        parser.add_argument(
+            "--pattern",
+            action="append",
+            dest="patterns",
+            default=None,
+            help="Regex with named group 'version' to extract version from filename, can be repeated",
+        )
+        parser.add_argument("--workers", type=int, default=None, help="Number of hashing processes")
+        parser.add_argument(
+            "--trust-md5",
+            action="store_true",
+            help="Use calculated MD5 as expected MD5",
+        )
+
+    def handle(self, *args, **options):
+        patterns = None
+        if options["patterns"]:
+            # checked before hashing starts, otherwise bad pattern fails the import on the first file
+            for pattern in options["patterns"]:
+                try:
+                    compiled = re.compile(pattern)
+                except re.error as exc:
+                    raise CommandError(f"Invalid --pattern '{pattern}': {exc}")
+                if "version" not in compiled.groupindex:
+                    raise CommandError(f"--pattern '{pattern}' has no named group 'version', e.g. (?P<version>...)")
+            patterns = [(pattern, "{version}") for pattern in options["patterns"]]
+        try:
+            summary = import_images(
+                directory=options["directory"],
+                link=options["link"],
+                patterns=patterns,
+                workers=options["workers"],
+                trust_md5=options["trust_md5"],
+            )
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(f"Imported: {len(summary['imported'])}"))
+        for filename in summary["exists"]:
+            self.stdout.write(f"Already exists: {filename}")
+        for filename in summary["no_version"]:
+            self.stdout.write(self.style.WARNING(f"Can not extract version: {filename}"))
+        for filename in summary["conflict"]:
+            self.stdout.write(self.style.ERROR(f"Different file with the same name in image folder: {filename}"))
+        for line in summary["failed"]:
+            self.stdout.write(self.style.ERROR(f"Failed: {line}"))
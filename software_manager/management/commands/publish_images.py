@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from ...models import SoftwareImage
+from ...publisher import publish_image
+
+
+class Command(BaseCommand):
+    help = "Publish golden images to configured file servers (FILE_SERVERS)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--server", action="append", dest="servers", help="Publish to this server only")
+        parser.add_argument("--all", action="store_true", help="Publish all images, not only golden ones")
+
+    def handle(self, *args, **options):
+        images = SoftwareImage.objects.exclude(image="").exclude(image__isnull=True)
+        if not options["all"]:
+            images = images.filter(goldenimage__isnull=False).distinct()
+        for sw in images:
+            for server, status in publish_image(sw.pk, options["servers"]).items():
+                style = self.style.SUCCESS if status == "published" else self.style.ERROR
+                self.stdout.write(style(f"{sw} -> {server}: {status}"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from ...retention import TASK_ARCHIVE_MODE, TASK_RETENTION_DAYS, purge_tasks
+
+
+class Command(BaseCommand):
+    help = "Archive and delete finished scheduled tasks older than retention period"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=TASK_RETENTION_DAYS, help="Retention period in days")
+        parser.add_argument("--mode", choices=["table", "ndjson", "none"], default=TASK_ARCHIVE_MODE, help="Archive mode")
+        parser.add_argument("--dry-run", action="store_true", help="Only count tasks to purge")
+
+    def handle(self, *args, **options):
+        summary = purge_tasks(days=options["days"], mode=options["mode"], dry_run=options["dry_run"])
+        if options["dry_run"]:
+            self.stdout.write(f"Tasks to purge: {summary['purged']}")
+            return
+        self.stdout.write(f"Purged: {summary['purged']}, archived: {summary['archived']}")
+        if summary["file"]:
+            self.stdout.write(f"Archive file: {summary['file']}")
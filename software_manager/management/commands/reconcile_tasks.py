@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from ...reconciler import reconcile_tasks
+
+
+class Command(BaseCommand):
+    help = "Fix status of scheduled tasks whose RQ jobs failed, finished or were lost without updating the task"
+
+    def handle(self, *args, **options):
+        summary = reconcile_tasks()
+        self.stdout.write(
+            f"Checked: {summary['checked']}, failed in RQ: {summary['failed']}, "
+            f"finished in RQ: {summary['finished']}, orphaned: {summary['orphaned']}"
+        )
+        if summary["orphans"]:
+            self.stdout.write(f"Orphaned tasks: {', '.join(str(pk) for pk in summary['orphans'])}")  # type: ignore
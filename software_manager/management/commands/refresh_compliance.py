@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from ...compliance import refresh_compliance
+
+
+class Command(BaseCommand):
+    help = "Rebuild device compliance (current vs golden image version) from custom field and golden images"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--device-type", type=int, action="append", dest="device_types", help="Device type ID")
+
+    def handle(self, *args, **options):
+        summary = refresh_compliance(options["device_types"])
+        self.stdout.write(f"Devices: {summary['devices']}, compliant: {summary['compliant']}")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from ...scrubber import scrub_images
+from ...uploads import cleanup_stale_uploads
+
+
+class Command(BaseCommand):
+    help = "Check integrity of software image files, changed files are hashed again"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Hash all files, even unchanged ones")
+        parser.add_argument("--workers", type=int, default=None, help="Number of hashing processes")
+
+    def handle(self, *args, **options):
+        summary = scrub_images(force=options["force"], workers=options["workers"])
+        self.stdout.write(
+            f"Checked: {summary['checked']}, unchanged: {summary['skipped']}, ok: {summary['ok']}, "
+            f"mismatch: {summary['mismatch']}, missing: {summary['missing']}"
+        )
+        for image in summary["flagged"]:  # type: ignore
+            self.stdout.write(self.style.ERROR(f"Integrity check failed: {image}"))
+        if removed := cleanup_stale_uploads():
+            self.stdout.write(f"Stale uploads removed: {removed}")
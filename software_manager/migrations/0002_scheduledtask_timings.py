@@ -0,0 +1,23 @@
+# Generated by Django 4.1.5 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("software_manager", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scheduledtask",
+            name="estimated_duration",
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="scheduledtask",
+            name="timings",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.1.5 on 2026-10-19 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("software_manager", "0002_scheduledtask_timings"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="softwareimage",
+            name="sha256sum",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="softwareimage",
+            name="sha512sum",
+            field=models.CharField(blank=True, max_length=128),
+        ),
+        migrations.AddField(
+            model_name="softwareimage",
+            name="image_size",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="softwareimage",
+            name="image_mtime",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
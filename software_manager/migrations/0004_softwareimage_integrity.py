@@ -0,0 +1,28 @@
+# Generated by Django 4.1.5 on 2026-10-19 10:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("software_manager", "0003_softwareimage_digests"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="softwareimage",
+            name="image_inode",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="softwareimage",
+            name="integrity_status",
+            field=models.CharField(default="unknown", max_length=16),
+        ),
+        migrations.AddField(
+            model_name="softwareimage",
+            name="scrubbed_time",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
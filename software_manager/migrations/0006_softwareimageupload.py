@@ -0,0 +1,32 @@
+# Generated by Django 4.1.5 on 2026-10-19 11:24
+
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("software_manager", "0005_imageblob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SoftwareImageUpload",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False)),
+                ("upload_id", models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ("filename", models.CharField(max_length=256)),
+                ("version", models.CharField(blank=True, max_length=32)),
+                ("md5sum", models.CharField(blank=True, max_length=36)),
+                ("size", models.BigIntegerField()),
+                ("received", models.JSONField(blank=True, default=list)),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("last_updated", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "ordering": ["-created"],
+            },
+        ),
+    ]
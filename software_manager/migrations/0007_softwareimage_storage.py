@@ -0,0 +1,27 @@
+# Generated by Django 4.1.5 on 2026-10-19 11:47
+
+import django.core.validators
+from django.db import migrations, models
+
+import software_manager.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("software_manager", "0006_softwareimageupload"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="softwareimage",
+            name="image",
+            field=models.FileField(
+                blank=True,
+                null=True,
+                storage=software_manager.storage.get_image_storage,
+                upload_to="software-images/",
+                validators=[django.core.validators.FileExtensionValidator(allowed_extensions=["bin"])],
+            ),
+        ),
+    ]
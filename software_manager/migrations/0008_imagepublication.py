@@ -0,0 +1,42 @@
+# Generated by Django 4.1.5 on 2026-10-19 12:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("software_manager", "0007_softwareimage_storage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImagePublication",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False)),
+                ("server", models.CharField(max_length=64)),
+                ("status", models.CharField(default="pending", max_length=16)),
+                ("size", models.BigIntegerField(blank=True, null=True)),
+                ("md5sum", models.CharField(blank=True, max_length=36)),
+                ("message", models.CharField(blank=True, max_length=512)),
+                ("published_time", models.DateTimeField(blank=True, null=True)),
+                ("last_updated", models.DateTimeField(auto_now=True)),
+                (
+                    "sw",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="publications",
+                        to="software_manager.softwareimage",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["sw", "server"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="imagepublication",
+            constraint=models.UniqueConstraint(fields=("sw", "server"), name="software_manager_publication_unique"),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.1.5 on 2026-10-19 12:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dcim", "0167_module_status"),
+        ("software_manager", "0008_imagepublication"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StagedImage",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False)),
+                ("file_system", models.CharField(max_length=32)),
+                ("verified_time", models.DateTimeField(auto_now=True)),
+                (
+                    "device",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="dcim.device",
+                    ),
+                ),
+                (
+                    "sw",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="staged",
+                        to="software_manager.softwareimage",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-verified_time"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="stagedimage",
+            constraint=models.UniqueConstraint(fields=("device", "sw"), name="software_manager_stagedimage_unique"),
+        ),
+    ]
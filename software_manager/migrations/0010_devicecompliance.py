@@ -0,0 +1,53 @@
+# Generated by Django 4.1.5 on 2026-10-19 13:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dcim", "0167_module_status"),
+        ("software_manager", "0009_stagedimage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeviceCompliance",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False)),
+                ("current_version", models.CharField(blank=True, max_length=32)),
+                ("target_version", models.CharField(blank=True, max_length=32)),
+                ("compliant", models.BooleanField(default=False)),
+                ("last_seen", models.DateTimeField(blank=True, null=True)),
+                ("last_updated", models.DateTimeField(auto_now=True)),
+                (
+                    "device",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="compliance",
+                        to="dcim.device",
+                    ),
+                ),
+                (
+                    "device_type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="dcim.devicetype",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["device"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="devicecompliance",
+            index=models.Index(fields=["compliant", "device_type"], name="software_ma_complia_type_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="devicecompliance",
+            index=models.Index(fields=["device_type", "target_version"], name="software_ma_complia_target_idx"),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.1.5 on 2026-10-19 13:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("software_manager", "0010_devicecompliance"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="scheduledtask",
+            index=models.Index(
+                fields=["-scheduled_time", "-start_time", "-end_time", "job_id"], name="software_ma_task_order_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="scheduledtask",
+            index=models.Index(fields=["job_id"], name="software_ma_task_job_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="scheduledtask",
+            index=models.Index(fields=["status", "scheduled_time"], name="software_ma_task_status_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="scheduledtask",
+            index=models.Index(fields=["task_type", "status", "-end_time"], name="software_ma_task_history_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="scheduledtask",
+            index=models.Index(
+                condition=models.Q(("confirmed", False), ("start_time__isnull", False)),
+                fields=["start_time"],
+                name="software_ma_task_nonack_idx",
+            ),
+        ),
+    ]
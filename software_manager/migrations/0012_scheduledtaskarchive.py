@@ -0,0 +1,49 @@
+# Generated by Django 4.1.5 on 2026-10-19 13:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dcim", "0167_module_status"),
+        ("software_manager", "0011_scheduledtask_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScheduledTaskArchive",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False)),
+                ("task_id", models.BigIntegerField(db_index=True)),
+                ("device_name", models.CharField(blank=True, max_length=64)),
+                ("task_type", models.CharField(max_length=255)),
+                ("status", models.CharField(max_length=255)),
+                ("fail_reason", models.CharField(max_length=255)),
+                ("message", models.CharField(blank=True, max_length=512)),
+                ("confirmed", models.BooleanField(default=False)),
+                ("scheduled_time", models.DateTimeField(null=True)),
+                ("start_time", models.DateTimeField(null=True)),
+                ("end_time", models.DateTimeField(null=True)),
+                ("mw_duration", models.PositiveIntegerField(null=True)),
+                ("user", models.CharField(blank=True, max_length=255)),
+                ("transfer_method", models.CharField(max_length=8)),
+                ("timings", models.JSONField(blank=True, default=dict)),
+                ("log_compressed", models.BinaryField(blank=True)),
+                ("archived_time", models.DateTimeField(auto_now_add=True)),
+                (
+                    "device",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="dcim.device",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-scheduled_time"],
+            },
+        ),
+    ]
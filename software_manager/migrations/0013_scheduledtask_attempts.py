@@ -0,0 +1,23 @@
+# Generated by Django 4.1.5 on 2026-10-19 15:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("software_manager", "0012_scheduledtaskarchive"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scheduledtask",
+            name="attempts",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="scheduledtaskarchive",
+            name="attempts",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -1,30 +1,56 @@
-import hashlib
+import os
+import uuid
+import zlib
 from pathlib import Path
 
 from dcim.models import Device, DeviceType
 from django.conf import settings
 from django.core.validators import FileExtensionValidator
 from django.db import models
-from django.db.models import Q
 from django.urls import reverse
-from django_rq import get_queue
 from netbox.models import NetBoxModel
-from rq.exceptions import NoSuchJobError
-from rq.job import Job
 from utilities.querysets import RestrictedQuerySet
 
-from .choices import TaskFailReasonChoices, TaskStatusChoices, TaskTransferMethod, TaskTypeChoices
+from .choices import (
+    ImageIntegrityChoices,
+    PublicationStatusChoices,
+    TaskFailReasonChoices,
+    TaskStatusChoices,
+    TaskTransferMethod,
+    TaskTypeChoices,
+)
+from .hashing import hash_file, hash_fileobj
+from .queues import delete_jobs, fetch_jobs, is_job_started
+from .storage import get_image_storage, is_local_storage
 
 PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get("software_manager", dict())
 CF_NAME_SW_VERSION = PLUGIN_SETTINGS.get("CF_NAME_SW_VERSION", "")
 FTP_USERNAME = PLUGIN_SETTINGS.get("FTP_USERNAME", "")
 IMAGE_FOLDER = PLUGIN_SETTINGS.get("IMAGE_FOLDER", "")
-UPGRADE_QUEUE = PLUGIN_SETTINGS.get("UPGRADE_QUEUE", "")
+TASK_DELETE_CHUNK_SIZE = 1000
+
+
+class ImageBlob(models.Model):
+    sha256 = models.CharField(
+        max_length=64,
+        unique=True,
+    )
+    size = models.BigIntegerField()
+    refcount = models.PositiveIntegerField(
+        default=0,
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+    )
+
+    def __str__(self) -> str:
+        return self.sha256
 
 
 class SoftwareImage(NetBoxModel):
     image = models.FileField(
         upload_to=f"{IMAGE_FOLDER}/",
+        storage=get_image_storage,
         validators=[FileExtensionValidator(allowed_extensions=["bin"])],
         null=True,
         blank=True,
@@ -41,6 +67,43 @@ class SoftwareImage(NetBoxModel):
         max_length=32,
         blank=True,
     )
+    sha256sum = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+    )
+    sha512sum = models.CharField(
+        max_length=128,
+        blank=True,
+    )
+    image_size = models.BigIntegerField(
+        null=True,
+        blank=True,
+    )
+    image_mtime = models.FloatField(
+        null=True,
+        blank=True,
+    )
+    image_inode = models.BigIntegerField(
+        null=True,
+        blank=True,
+    )
+    integrity_status = models.CharField(
+        max_length=16,
+        choices=ImageIntegrityChoices,
+        default=ImageIntegrityChoices.INTEGRITY_UNKNOWN,
+    )
+    scrubbed_time = models.DateTimeField(
+        null=True,
+        blank=True,
+    )
+    blob = models.ForeignKey(
+        to=ImageBlob,
+        on_delete=models.PROTECT,
+        related_name="images",
+        null=True,
+        blank=True,
+    )
     filename = models.CharField(
         max_length=256,
         blank=True,
@@ -57,20 +120,93 @@ class SoftwareImage(NetBoxModel):
             self.filename = ""
             self.md5sum_calculated = ""
             self.md5sum = ""
+            self._set_hashes({})
+            self.image_size = None
+            self.image_mtime = None
+            self.image_inode = None
+            self.integrity_status = ImageIntegrityChoices.INTEGRITY_UNKNOWN
             super().save(*args, **kwargs)
             return
 
-        self.filename = self.image.name.rsplit("/", 1)[-1]
+        if not self.image._committed:
+            # New upload. Digests were calculated by HashingFileUploadHandler while file was streamed.
+            hashes = getattr(self.image.file, "hashes", None)
+            self.image.save(self.image.name, self.image.file, save=False)
+            self._set_hashes(hashes or self.hash_image())
+            from .image_store import attach_blob, release_blob  # image_store depends on models
+
+            # file of existing image is replaced, old content is released before the new one is linked
+            release_blob(self)
+            attach_blob(self)
+            self._set_fingerprint(self._stat_image())
+            if not is_local_storage():
+                self.image_size = self.image.size
+            self.integrity_status = ImageIntegrityChoices.INTEGRITY_OK
+        elif (stat := self._stat_image()) is not None and not self._fingerprint_matches(stat):
+            # File was changed on a disk (or record was created before fingerprints were stored)
+            self.apply_integrity_check(stat, hash_file(self.image.path))
 
-        md5 = hashlib.md5()
-        for chunk in self.image.chunks():
-            md5.update(chunk)
-        self.md5sum_calculated = md5.hexdigest()
+        self.filename = self.image.name.rsplit("/", 1)[-1]
         super().save(*args, **kwargs)
 
+    def _set_hashes(self, hashes: dict[str, str]) -> None:
+        self.md5sum_calculated = hashes.get("md5", "")
+        self.sha256sum = hashes.get("sha256", "")
+        self.sha512sum = hashes.get("sha512", "")
+
+    def hash_image(self) -> dict[str, str]:
+        if is_local_storage():
+            return hash_file(self.image.path)
+        with self.image.storage.open(self.image.name, "rb") as f:
+            return hash_fileobj(f)
+
+    def _stat_image(self) -> os.stat_result | None:
+        # object storage has no mtime/inode fingerprint, images there are checked by the scrubber on --force only
+        if not is_local_storage():
+            return None
+        try:
+            return os.stat(self.image.path)
+        except OSError:
+            return None
+
+    def _fingerprint_matches(self, stat: os.stat_result) -> bool:
+        return (
+            self.image_size == stat.st_size
+            and self.image_mtime == stat.st_mtime
+            and self.image_inode in (None, stat.st_ino)
+        )
+
+    def _set_fingerprint(self, stat: os.stat_result | None) -> None:
+        if stat is None:
+            return
+        self.image_size = stat.st_size
+        self.image_mtime = stat.st_mtime
+        self.image_inode = stat.st_ino
+
+    def apply_integrity_check(self, stat: os.stat_result | None, hashes: dict[str, str]) -> None:
+        # md5sum_calculated is the digest of the file as it was uploaded. Different content means
+        # the file was corrupted/replaced, keep original digest and flag the image.
+        if self.md5sum_calculated and hashes["md5"] != self.md5sum_calculated:
+            self.integrity_status = ImageIntegrityChoices.INTEGRITY_MISMATCH
+            return
+        self._set_hashes({"sha256": self.sha256sum, "sha512": self.sha512sum, **hashes})
+        self._set_fingerprint(stat)
+        self.integrity_status = ImageIntegrityChoices.INTEGRITY_OK
+
+    @property
+    def integrity_failed(self) -> bool:
+        return self.integrity_status in (
+            ImageIntegrityChoices.INTEGRITY_MISMATCH,
+            ImageIntegrityChoices.INTEGRITY_MISSING,
+        )
+
     def delete(self, *args, **kwargs) -> tuple[int, dict[str, int]]:
         if self.image_exists:
-            Path(self.image.path).unlink(missing_ok=True)
+            self.image.storage.delete(self.image.name)
+        # blob content is removed with the last alias only
+        from .image_store import release_blob  # image_store depends on models
+
+        release_blob(self)
         return super().delete(*args, **kwargs)
 
     def __str__(self) -> str:
@@ -90,6 +226,177 @@ class SoftwareImage(NetBoxModel):
         return reverse("plugins:software_manager:softwareimage", kwargs={"pk": self.pk})
 
 
+class SoftwareImageUpload(models.Model):
+    upload_id = models.UUIDField(
+        default=uuid.uuid4,
+        unique=True,
+        editable=False,
+    )
+    filename = models.CharField(
+        max_length=256,
+    )
+    version = models.CharField(
+        max_length=32,
+        blank=True,
+    )
+    md5sum = models.CharField(
+        max_length=36,
+        blank=True,
+    )
+    size = models.BigIntegerField()
+    # received byte ranges [[start, end), ...], merged and sorted
+    received = models.JSONField(
+        default=list,
+        blank=True,
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+    )
+    last_updated = models.DateTimeField(
+        auto_now=True,
+    )
+
+    class Meta:
+        ordering = ["-created"]
+
+    def __str__(self) -> str:
+        return f"{self.filename} ({self.upload_id})"
+
+    @property
+    def part_path(self) -> Path:
+        # next to final location, so finalize is a rename
+        return Path(settings.MEDIA_ROOT, IMAGE_FOLDER, f".upload-{self.upload_id}.part")
+
+    @property
+    def offset(self) -> int:
+        # contiguous prefix received
+        if self.received and self.received[0][0] == 0:
+            return self.received[0][1]
+        return 0
+
+    @property
+    def is_complete(self) -> bool:
+        return self.offset == self.size
+
+
+class ImagePublication(models.Model):
+    sw = models.ForeignKey(
+        to=SoftwareImage,
+        on_delete=models.CASCADE,
+        related_name="publications",
+    )
+    server = models.CharField(
+        max_length=64,
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=PublicationStatusChoices,
+        default=PublicationStatusChoices.STATUS_PENDING,
+    )
+    size = models.BigIntegerField(
+        null=True,
+        blank=True,
+    )
+    md5sum = models.CharField(
+        max_length=36,
+        blank=True,
+    )
+    message = models.CharField(
+        max_length=512,
+        blank=True,
+    )
+    published_time = models.DateTimeField(
+        null=True,
+        blank=True,
+    )
+    last_updated = models.DateTimeField(
+        auto_now=True,
+    )
+
+    class Meta:
+        ordering = ["sw", "server"]
+        constraints = [
+            models.UniqueConstraint(fields=["sw", "server"], name="software_manager_publication_unique"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.sw} @ {self.server}"
+
+
+# Verify ledger: device has this image on flash and its MD5 was verified. Used to find same-site peers
+# to copy the image from.
+class StagedImage(models.Model):
+    device = models.ForeignKey(
+        to=Device,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    sw = models.ForeignKey(
+        to=SoftwareImage,
+        on_delete=models.CASCADE,
+        related_name="staged",
+    )
+    file_system = models.CharField(
+        max_length=32,
+    )
+    verified_time = models.DateTimeField(
+        auto_now=True,
+    )
+
+    class Meta:
+        ordering = ["-verified_time"]
+        constraints = [
+            models.UniqueConstraint(fields=["device", "sw"], name="software_manager_stagedimage_unique"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.sw} @ {self.device}"
+
+
+# Current vs target version per device, maintained by executor and compliance refresher, so lists and
+# counts do not parse custom_field_data JSON and walk device_type.golden_image.sw per device.
+class DeviceCompliance(models.Model):
+    device = models.OneToOneField(
+        to=Device,
+        on_delete=models.CASCADE,
+        related_name="compliance",
+    )
+    device_type = models.ForeignKey(
+        to=DeviceType,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    current_version = models.CharField(
+        max_length=32,
+        blank=True,
+    )
+    target_version = models.CharField(
+        max_length=32,
+        blank=True,
+    )
+    compliant = models.BooleanField(
+        default=False,
+    )
+    # last time version was read from the device itself
+    last_seen = models.DateTimeField(
+        null=True,
+        blank=True,
+    )
+    last_updated = models.DateTimeField(
+        auto_now=True,
+    )
+
+    class Meta:
+        ordering = ["device"]
+        indexes = [
+            models.Index(fields=["compliant", "device_type"], name="software_ma_complia_type_idx"),
+            models.Index(fields=["device_type", "target_version"], name="software_ma_complia_target_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.device}: {self.current_version or '-'} -> {self.target_version or '-'}"
+
+
 class GoldenImage(NetBoxModel):
     pid = models.OneToOneField(
         to=DeviceType,
@@ -114,30 +421,33 @@ class GoldenImage(NetBoxModel):
         return f"<{self.__class__.__name__}: {str(self)}>"
 
     def get_progress(self) -> float:
-        total = self.pid.instances.count()
-        if total == 0:
+        counts = self.pid.instances.aggregate(
+            total=models.Count("pk"),
+            upgraded=models.Count("pk", filter=models.Q(compliance__compliant=True)),
+        )
+        if counts["total"] == 0:
             return 0.0
-        upgraded = Device.objects.filter(
-            **{f"custom_field_data__{CF_NAME_SW_VERSION}": self.sw.version},
-            device_type=self.pid,
-        ).count()
-        return round(upgraded / total * 100, 2)
+        return round(counts["upgraded"] / counts["total"] * 100, 2)
 
 
 class ScheduledTaskQuerySet(RestrictedQuerySet):
     def delete(self):
-        exclude_list = []
-        queue = get_queue(UPGRADE_QUEUE)
-        for i in self:
-            try:
-                j = Job.fetch(i.job_id, queue.connection)
-                if not j.is_started:
-                    j.delete()
-                else:
-                    exclude_list.append(i.job_id)
-            except NoSuchJobError:
-                pass
-        return super(ScheduledTaskQuerySet, self.exclude(Q(job_id__in=exclude_list))).delete()
+        rows = list(self.values_list("pk", "job_id"))
+        jobs = fetch_jobs(job_id for _, job_id in rows)
+        # Running tasks can not be deleted, other jobs are cancelled in one pipeline
+        started = {job_id for job_id, job in jobs.items() if is_job_started(job)}
+        delete_jobs(job for job_id, job in jobs.items() if job is not None and job_id not in started)
+
+        pks = [pk for pk, job_id in rows if job_id not in started]
+        total = 0
+        per_model: dict[str, int] = {}
+        for i in range(0, len(pks), TASK_DELETE_CHUNK_SIZE):
+            chunk = self.model.objects.filter(pk__in=pks[i : i + TASK_DELETE_CHUNK_SIZE])
+            deleted, detail = super(ScheduledTaskQuerySet, chunk).delete()
+            total += deleted
+            for label, count in detail.items():
+                per_model[label] = per_model.get(label, 0) + count
+        return total, per_model
 
 
 class ScheduledTaskManager(models.Manager):
@@ -201,6 +511,17 @@ class ScheduledTask(NetBoxModel):
         choices=TaskTransferMethod,
         default=TaskTransferMethod.METHOD_FTP,
     )
+    estimated_duration = models.PositiveIntegerField(
+        null=True,
+    )
+    timings = models.JSONField(
+        default=dict,
+        blank=True,
+    )
+    # runs of the task, transient failures are retried inside MW
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+    )
 
     objects = ScheduledTaskManager()
 
@@ -211,14 +532,12 @@ class ScheduledTask(NetBoxModel):
             return f"{self.device}: {self.job_id}"
 
     def delete(self):
-        queue = get_queue(UPGRADE_QUEUE)
-        try:
-            j = Job.fetch(self.job_id, queue.connection)
-            if not j.is_started:
-                j.delete()
-                return super().delete()
-        except NoSuchJobError:
-            return super().delete()
+        job = fetch_jobs([self.job_id]).get(self.job_id)
+        if is_job_started(job):
+            return
+        if job is not None:
+            delete_jobs([job])
+        return super().delete()
 
     def get_absolute_url(self) -> str:
         return reverse("plugins:software_manager:scheduledtask", kwargs={"pk": self.pk})
@@ -230,4 +549,118 @@ class ScheduledTask(NetBoxModel):
             "-end_time",
             "job_id",
         ]
+        indexes = [
+            # default list ordering, also batch lookups by scheduled_time
+            models.Index(fields=["-scheduled_time", "-start_time", "-end_time", "job_id"], name="software_ma_task_order_idx"),
+            models.Index(fields=["job_id"], name="software_ma_task_job_idx"),
+            # reconciler, coalescing
+            models.Index(fields=["status", "scheduled_time"], name="software_ma_task_status_idx"),
+            # duration estimator history
+            models.Index(fields=["task_type", "status", "-end_time"], name="software_ma_task_history_idx"),
+            # failure threshold: started, not ACKed tasks are a small part of the table
+            models.Index(
+                fields=["start_time"],
+                condition=models.Q(confirmed=False, start_time__isnull=False),
+                name="software_ma_task_nonack_idx",
+            ),
+        ]
         verbose_name = "Scheduled Task"
+
+
+# Purged tasks, log is zlib-compressed
+class ScheduledTaskArchive(models.Model):
+    task_id = models.BigIntegerField(
+        db_index=True,
+    )
+    device = models.ForeignKey(
+        to=Device,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="+",
+    )
+    device_name = models.CharField(
+        max_length=64,
+        blank=True,
+    )
+    task_type = models.CharField(
+        max_length=255,
+    )
+    status = models.CharField(
+        max_length=255,
+    )
+    fail_reason = models.CharField(
+        max_length=255,
+    )
+    message = models.CharField(
+        max_length=512,
+        blank=True,
+    )
+    confirmed = models.BooleanField(
+        default=False,
+    )
+    scheduled_time = models.DateTimeField(
+        null=True,
+    )
+    start_time = models.DateTimeField(
+        null=True,
+    )
+    end_time = models.DateTimeField(
+        null=True,
+    )
+    mw_duration = models.PositiveIntegerField(
+        null=True,
+    )
+    user = models.CharField(
+        max_length=255,
+        blank=True,
+    )
+    transfer_method = models.CharField(
+        max_length=8,
+    )
+    timings = models.JSONField(
+        default=dict,
+        blank=True,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+    )
+    log_compressed = models.BinaryField(
+        blank=True,
+    )
+    archived_time = models.DateTimeField(
+        auto_now_add=True,
+    )
+
+    class Meta:
+        ordering = ["-scheduled_time"]
+
+    def __str__(self) -> str:
+        return f"{self.device_name or 'unknown'}: {self.task_id}"
+
+    @property
+    def log(self) -> str:
+        if not self.log_compressed:
+            return ""
+        return zlib.decompress(self.log_compressed).decode()
+
+    @classmethod
+    def from_task(cls, task: ScheduledTask) -> "ScheduledTaskArchive":
+        return cls(
+            task_id=task.pk,
+            device_id=task.device_id,
+            device_name=str(task.device or "")[:64],
+            task_type=task.task_type,
+            status=task.status,
+            fail_reason=task.fail_reason,
+            message=task.message,
+            confirmed=task.confirmed,
+            scheduled_time=task.scheduled_time,
+            start_time=task.start_time,
+            end_time=task.end_time,
+            mw_duration=task.mw_duration,
+            user=task.user,
+            transfer_method=task.transfer_method,
+            timings=task.timings,
+            attempts=task.attempts,
+            log_compressed=zlib.compress(task.log.encode(), 6) if task.log else b"",
+        )
@@ -0,0 +1,56 @@
+import socket
+from contextlib import contextmanager
+from typing import Iterator
+
+from dcim.models import Device
+from django.conf import settings
+
+from .models import SoftwareImage, StagedImage
+from .queues import get_connection
+
+PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get("software_manager", dict())
+# Devices copy image via SCP from a device of the same site which already has it verified
+PEER_DISTRIBUTION = PLUGIN_SETTINGS.get("PEER_DISTRIBUTION", False)
+# Concurrent copies served by one peer. New peers appear as copies complete, so distribution fans out as a tree.
+PEER_MAX_FANOUT = PLUGIN_SETTINGS.get("PEER_MAX_FANOUT", 2)
+PEER_CANDIDATES = 5
+
+
+def record_staged(device: Device, sw: SoftwareImage, file_system: str) -> None:
+    StagedImage.objects.update_or_create(device=device, sw=sw, defaults={"file_system": file_system})
+
+
+def forget_staged(device: Device, sw: SoftwareImage) -> None:
+    StagedImage.objects.filter(device=device, sw=sw).delete()
+
+
+def get_peer_candidates(device: Device, sw: SoftwareImage) -> list[StagedImage]:
+    if device.site_id is None:
+        return []
+    return list(
+        StagedImage.objects.filter(sw=sw, device__site_id=device.site_id, device__primary_ip4__isnull=False)
+        .exclude(device=device)
+        .select_related("device__primary_ip4")[:PEER_CANDIDATES]
+    )
+
+
+def is_ssh_open(host: str, timeout: int = 5) -> bool:
+    try:
+        with socket.create_connection((host, 22), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+# Counts copies served by the peer, yields False if it already serves PEER_MAX_FANOUT copies.
+# Counter expires in case worker dies.
+@contextmanager
+def peer_slot(peer: Device, ttl: int = 7200) -> Iterator[bool]:
+    connection = get_connection()
+    key = f"software_manager:peer-serving:{peer.pk}"
+    serving = connection.incr(key)
+    connection.expire(key, ttl)
+    try:
+        yield serving <= PEER_MAX_FANOUT
+    finally:
+        connection.decr(key)
@@ -0,0 +1,131 @@
+import ftplib
+import hashlib
+import json
+from datetime import datetime
+
+import requests
+from django.conf import settings
+from redis.exceptions import LockError
+
+from .choices import TaskTransferMethod
+from .models import SoftwareImage
+from .queues import get_connection
+from .storage import get_image_url, is_local_storage
+
+PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get("software_manager", dict())
+FTP_USERNAME = PLUGIN_SETTINGS.get("FTP_USERNAME", "")
+FTP_PASSWORD = PLUGIN_SETTINGS.get("FTP_PASSWORD", "")
+FTP_SERVER = PLUGIN_SETTINGS.get("FTP_SERVER", "")
+HTTP_SERVER = PLUGIN_SETTINGS.get("HTTP_SERVER", "")
+# Bytes compared at the start, middle and end of the file
+PROBE_SAMPLE_SIZE = PLUGIN_SETTINGS.get("PROBE_SAMPLE_SIZE", 64 * 1024)
+PROBE_TIMEOUT = PLUGIN_SETTINGS.get("PROBE_TIMEOUT", 30)
+
+
+def _sample_offsets(size: int) -> list[int]:
+    if size <= PROBE_SAMPLE_SIZE:
+        return [0]
+    return sorted({0, (size - PROBE_SAMPLE_SIZE) // 2, size - PROBE_SAMPLE_SIZE})
+
+
+def _local_samples(sw: SoftwareImage, offsets: list[int]) -> str:
+    digest = hashlib.sha256()
+    with sw.image.storage.open(sw.image.name, "rb") as f:
+        for offset in offsets:
+            f.seek(offset)
+            digest.update(f.read(PROBE_SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+def _probe_http(url: str, size: int, offsets: list[int]) -> tuple[int | None, str]:
+    with requests.Session() as session:
+        response = session.head(url, timeout=PROBE_TIMEOUT, allow_redirects=True)
+        response.raise_for_status()
+        remote_size = int(response.headers["Content-Length"]) if "Content-Length" in response.headers else None
+        if remote_size != size:
+            return remote_size, ""
+        digest = hashlib.sha256()
+        for offset in offsets:
+            end = min(offset + PROBE_SAMPLE_SIZE, size) - 1
+            response = session.get(url, headers={"Range": f"bytes={offset}-{end}"}, timeout=PROBE_TIMEOUT)
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise ValueError("server does not support Range requests")
+            digest.update(response.content)
+        return remote_size, digest.hexdigest()
+
+
+def _ftp_read(ftp: ftplib.FTP, name: str, offset: int, length: int) -> bytes:
+    data = b""
+    with ftp.transfercmd(f"RETR {name}", rest=offset or None) as conn:
+        while len(data) < length and (chunk := conn.recv(length - len(data))):
+            data += chunk
+    # transfer is aborted early, server replies 426/451 instead of 226
+    try:
+        ftp.voidresp()
+    except ftplib.Error:
+        pass
+    return data
+
+
+def _probe_ftp(name: str, size: int, offsets: list[int]) -> tuple[int | None, str]:
+    with ftplib.FTP(FTP_SERVER, timeout=PROBE_TIMEOUT) as ftp:
+        ftp.login(FTP_USERNAME or "anonymous", FTP_PASSWORD)
+        ftp.voidcmd("TYPE I")
+        try:
+            remote_size = ftp.size(name)
+        except ftplib.error_perm:
+            return None, ""
+        if remote_size != size:
+            return remote_size, ""
+        digest = hashlib.sha256()
+        for offset in offsets:
+            digest.update(_ftp_read(ftp, name, offset, min(PROBE_SAMPLE_SIZE, size - offset)))
+        return remote_size, digest.hexdigest()
+
+
+# Checks the image the way device will request it: size and sampled hash of start/middle/end
+# bytes. Returns (ok, message).
+def probe_image(sw: SoftwareImage, transfer_method: str) -> tuple[bool, str]:
+    size = sw.image_size or sw.image.size
+    offsets = _sample_offsets(size)
+    try:
+        if transfer_method == TaskTransferMethod.METHOD_FTP:
+            location = f"ftp://{FTP_SERVER}/{sw.filename}"
+            remote_size, remote_digest = _probe_ftp(sw.filename, size, offsets)
+        elif transfer_method == TaskTransferMethod.METHOD_HTTP:
+            if is_local_storage():
+                location = url = f"{HTTP_SERVER}{sw.filename}"
+            else:
+                location, url = "object storage", get_image_url(sw.image.name)
+            remote_size, remote_digest = _probe_http(url, size, offsets)
+        else:
+            return True, f"no probe for '{transfer_method}' transfer method"
+    except Exception as e:
+        return False, f"{sw.filename} is not available on file server: {e.__class__.__name__}: {e}"
+
+    if remote_size is None:
+        return False, f"{location} does not exist"
+    if remote_size != size:
+        return False, f"{location} size {remote_size} differs from image size {size}"
+    if remote_digest != _local_samples(sw, offsets):
+        return False, f"{location} content differs from image (sampled hash)"
+    return True, f"{location} is available"
+
+
+# Result is shared by all tasks of the batch (same image, transfer method and scheduled time): the
+# first task probes under a lock, the rest reuse cached result until the end of MW.
+def probe_image_cached(sw: SoftwareImage, transfer_method: str, batch_time: datetime, ttl: int) -> tuple[bool, str]:
+    connection = get_connection()
+    key = f"software_manager:probe:{transfer_method}:{sw.pk}:{sw.md5sum_calculated}:{int(batch_time.timestamp())}"
+    try:
+        with connection.lock(f"{key}:lock", timeout=PROBE_TIMEOUT * 5, blocking_timeout=PROBE_TIMEOUT * 6):
+            if (cached := connection.get(key)) is not None:
+                ok, message = json.loads(cached)
+                return ok, message
+            ok, message = probe_image(sw, transfer_method)
+            connection.set(key, json.dumps([ok, message]), ex=max(int(ttl), 60))
+    except LockError:
+        # lock holder is stuck or lock expired during probe, result is not shared
+        return probe_image(sw, transfer_method)
+    return ok, message
@@ -0,0 +1,155 @@
+import ftplib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+
+import pytz
+from django.conf import settings
+from django.db import connection
+
+from .choices import PublicationStatusChoices, TaskTypeChoices
+from .hashing import HASH_BUFFER_SIZE, hash_file
+from .models import ImagePublication, SoftwareImage
+from .queues import get_task_queue
+
+PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get("software_manager", dict())
+# File servers devices copy images from. "local" is a directory served by ftp/http container (volume),
+# "ftp" is uploaded to. "methods" are transfer methods served from this server.
+#   {"name": "ftp", "type": "local", "root": "/srv/ftp", "methods": ["ftp"]}
+#   {"name": "dc2-ftp", "type": "ftp", "host": "10.0.0.1", "username": "...", "password": "...", "root": "/", "methods": ["ftp"]}
+FILE_SERVERS = PLUGIN_SETTINGS.get("FILE_SERVERS", [])
+PUBLISH_WORKERS = PLUGIN_SETTINGS.get("PUBLISH_WORKERS", 4)
+PUBLISH_TIMEOUT = PLUGIN_SETTINGS.get("PUBLISH_TIMEOUT", 4 * 3600)
+
+
+def get_file_servers(transfer_method: str | None = None) -> list[dict]:
+    return [s for s in FILE_SERVERS if transfer_method is None or transfer_method in s.get("methods", [])]
+
+
+def _copy_from(source, target, offset: int) -> None:
+    source.seek(offset)
+    while data := source.read(HASH_BUFFER_SIZE):
+        target.write(data)
+
+
+# Partial file (".<name>.part") is kept between attempts, copy is resumed from its size. File is
+# renamed to the final name only after MD5 is verified.
+def _publish_local(server: dict, sw: SoftwareImage, publication: ImagePublication) -> str:
+    root = Path(server["root"])
+    target = root / sw.filename
+    size = sw.image_size or sw.image.size
+    if target.is_file() and target.stat().st_size == size and hash_file(target)["md5"] == sw.md5sum_calculated:
+        return "already published"
+
+    part = root / f".{sw.filename}.part"
+    offset = part.stat().st_size if part.is_file() else 0
+    if offset > size:
+        offset = 0
+    with sw.image.storage.open(sw.image.name, "rb") as source, open(part, "ab" if offset else "wb") as f:
+        f.truncate(offset)
+        _copy_from(source, f, offset)
+    if (md5 := hash_file(part)["md5"]) != sw.md5sum_calculated:
+        part.unlink(missing_ok=True)
+        raise ValueError(f"MD5 mismatch after copy: {md5}")
+    os.replace(part, target)
+    return f"copied {size - offset} bytes" + (f" (resumed at {offset})" if offset else "")
+
+
+def _ftp_size(ftp: ftplib.FTP, name: str) -> int | None:
+    try:
+        return ftp.size(name)
+    except ftplib.error_perm:
+        return None
+
+
+# FTP has no standard way to hash remote file: image is skipped when its size matches and it was
+# published with the same MD5 before. Upload is resumed with REST.
+def _publish_ftp(server: dict, sw: SoftwareImage, publication: ImagePublication) -> str:
+    size = sw.image_size or sw.image.size
+    with ftplib.FTP(timeout=60) as ftp:
+        ftp.connect(server["host"], server.get("port", 21))
+        ftp.login(server.get("username", "anonymous"), server.get("password", ""))
+        if server.get("root"):
+            ftp.cwd(server["root"])
+        ftp.voidcmd("TYPE I")
+        if _ftp_size(ftp, sw.filename) == size and publication.md5sum == sw.md5sum_calculated:
+            return "already published"
+
+        part = f".{sw.filename}.part"
+        offset = _ftp_size(ftp, part) or 0
+        if offset > size:
+            offset = 0
+        with sw.image.storage.open(sw.image.name, "rb") as source:
+            source.seek(offset)
+            ftp.storbinary(f"STOR {part}", source, blocksize=HASH_BUFFER_SIZE, rest=offset or None)
+        if (uploaded := _ftp_size(ftp, part)) != size:
+            raise ValueError(f"Size mismatch after upload: {uploaded} of {size} bytes")
+        ftp.rename(part, sw.filename)
+    return f"uploaded {size - offset} bytes" + (f" (resumed at {offset})" if offset else "")
+
+
+PUBLISHERS = {
+    "local": _publish_local,
+    "ftp": _publish_ftp,
+}
+
+
+def _publish(sw: SoftwareImage, server: dict) -> str:
+    publication, _ = ImagePublication.objects.get_or_create(sw=sw, server=server["name"])
+    publication.status = PublicationStatusChoices.STATUS_PUBLISHING
+    publication.save()
+    try:
+        publication.message = PUBLISHERS[server.get("type", "local")](server, sw, publication)[:512]
+        publication.status = PublicationStatusChoices.STATUS_PUBLISHED
+        publication.size = sw.image_size or sw.image.size
+        publication.md5sum = sw.md5sum_calculated
+        publication.published_time = datetime.now().replace(microsecond=0).astimezone(pytz.utc)
+    except Exception as e:
+        publication.status = PublicationStatusChoices.STATUS_FAILED
+        publication.message = f"{e.__class__.__name__}: {e}"[:512]
+    finally:
+        publication.save()
+        # thread has its own DB connection
+        connection.close()
+    return publication.status
+
+
+# RQ job: pushes image to all (or selected) file servers in parallel
+def publish_image(sw_pk: int, servers: list[str] | None = None) -> dict[str, str]:
+    sw = SoftwareImage.objects.get(pk=sw_pk)
+    targets = [s for s in get_file_servers() if servers is None or s["name"] in servers]
+    if not sw.image_exists or not targets:
+        return {}
+    with ThreadPoolExecutor(max_workers=PUBLISH_WORKERS) as pool:
+        results = pool.map(partial(_publish, sw), targets)
+        return dict(zip([s["name"] for s in targets], results))
+
+
+def enqueue_publish(sw: SoftwareImage, servers: list[str] | None = None) -> None:
+    names = [s["name"] for s in get_file_servers() if servers is None or s["name"] in servers]
+    if not sw.image_exists or not names:
+        return
+    for name in names:
+        ImagePublication.objects.update_or_create(
+            sw=sw,
+            server=name,
+            defaults={"status": PublicationStatusChoices.STATUS_PENDING, "message": ""},
+        )
+    # long copies go to upload lane
+    get_task_queue(TaskTypeChoices.TYPE_UPLOAD).enqueue(publish_image, sw.pk, servers, job_timeout=PUBLISH_TIMEOUT)
+
+
+def get_unpublished_servers(sw: SoftwareImage, transfer_method: str) -> list[str]:
+    names = [s["name"] for s in get_file_servers(transfer_method)]
+    if not names:
+        return []
+    published = set(
+        sw.publications.filter(
+            server__in=names,
+            status=PublicationStatusChoices.STATUS_PUBLISHED,
+            md5sum=sw.md5sum_calculated,
+        ).values_list("server", flat=True)
+    )
+    return [name for name in names if name not in published]
@@ -0,0 +1,65 @@
+from typing import Iterable
+
+from django.conf import settings
+from django_rq import get_queue
+from rq.job import Job, JobStatus
+from rq.queue import Queue
+
+from .choices import TaskTypeChoices
+
+PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get("software_manager", dict())
+UPGRADE_QUEUE = PLUGIN_SETTINGS.get("UPGRADE_QUEUE", "")
+# Uploads (image pre-staging) can take hours, so they may be routed to their own queue. Without
+# this setting both task types share UPGRADE_QUEUE, as before.
+UPLOAD_QUEUE = PLUGIN_SETTINGS.get("UPLOAD_QUEUE", UPGRADE_QUEUE)
+JOB_FETCH_CHUNK_SIZE = 1000
+
+TASK_QUEUES = {
+    TaskTypeChoices.TYPE_UPLOAD: UPLOAD_QUEUE,
+    TaskTypeChoices.TYPE_UPGRADE: UPGRADE_QUEUE,
+    # coalesced upload and upgrade for one device, reloads the box, so it goes to upgrade lane
+    TaskTypeChoices.TYPE_UPLOAD_UPGRADE: UPGRADE_QUEUE,
+}
+
+
+def get_task_queue_name(task_type: str) -> str:
+    return TASK_QUEUES.get(task_type, UPGRADE_QUEUE)
+
+
+def get_task_queue(task_type: str) -> Queue:
+    return get_queue(get_task_queue_name(task_type))
+
+
+def get_task_queues() -> list[Queue]:
+    # Upgrade lane first: it is the priority lane and keeps this order for any caller iterating queues.
+    names = [UPGRADE_QUEUE]
+    names.extend(name for name in TASK_QUEUES.values() if name not in names)
+    return [get_queue(name) for name in names]
+
+
+def get_connection():
+    return get_queue(UPGRADE_QUEUE).connection
+
+
+# One pipelined round-trip per chunk instead of Job.fetch per id. Missing jobs are returned as None.
+def fetch_jobs(job_ids: Iterable[str]) -> dict[str, Job | None]:
+    connection = get_connection()
+    ids = list(dict.fromkeys(job_id for job_id in job_ids if job_id))
+    jobs = {}
+    for i in range(0, len(ids), JOB_FETCH_CHUNK_SIZE):
+        chunk = ids[i : i + JOB_FETCH_CHUNK_SIZE]
+        jobs.update(zip(chunk, Job.fetch_many(chunk, connection=connection)))
+    return jobs
+
+
+def is_job_started(job: Job | None) -> bool:
+    # status was loaded by fetch, no need for another round-trip
+    return job is not None and job.get_status(refresh=False) == JobStatus.STARTED
+
+
+def delete_jobs(jobs: Iterable[Job]) -> None:
+    connection = get_connection()
+    with connection.pipeline() as pipe:
+        for job in jobs:
+            job.delete(pipeline=pipe)
+        pipe.execute()
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+
+import pytz
+from django.conf import settings
+from rq.job import JobStatus
+from rq.registry import FailedJobRegistry, FinishedJobRegistry, ScheduledJobRegistry, StartedJobRegistry
+
+from .choices import TaskFailReasonChoices, TaskStatusChoices
+from .models import ScheduledTask
+from .queues import fetch_jobs, get_task_queues
+
+PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get("software_manager", dict())
+# Tasks younger than this are skipped, job_id is assigned right after the task is created.
+RECONCILE_GRACE_PERIOD = PLUGIN_SETTINGS.get("RECONCILE_GRACE_PERIOD", 300)
+
+ALIVE_JOB_STATUSES = (
+    JobStatus.QUEUED,
+    JobStatus.STARTED,
+    JobStatus.SCHEDULED,
+    JobStatus.DEFERRED,
+)
+
+NON_TERMINAL_STATUSES = (
+    TaskStatusChoices.STATUS_UNKNOWN,
+    TaskStatusChoices.STATUS_SCHEDULED,
+    TaskStatusChoices.STATUS_RUNNING,
+)
+
+
+def _collect_registries() -> dict[str, set[str]]:
+    registries: dict[str, set[str]] = {
+        "started": set(),
+        "failed": set(),
+        "finished": set(),
+        "pending": set(),
+    }
+    for queue in get_task_queues():
+        started = StartedJobRegistry(queue=queue)
+        # moves jobs of dead workers (OOM, job_timeout) with expired score into FailedJobRegistry
+        started.cleanup()
+        # Registries are read in the order jobs move through them (scheduled -> queue -> started ->
+        # finished/failed), so a job moved between two reads is still seen in the later one.
+        registries["pending"].update(ScheduledJobRegistry(queue=queue).get_job_ids())
+        registries["pending"].update(queue.get_job_ids())
+        registries["started"].update(started.get_job_ids())
+        registries["finished"].update(FinishedJobRegistry(queue=queue).get_job_ids())
+        registries["failed"].update(FailedJobRegistry(queue=queue).get_job_ids())
+    return registries
+
+
+# Fixes tasks which never reached end of worker.upgrade_device, e.g. worker was OOM-killed or job was
+# stopped by job_timeout. Registries are read in bulk and compared with all non-terminal tasks at once.
+def reconcile_tasks() -> dict[str, int | list[int]]:
+    now = datetime.now().replace(microsecond=0).astimezone(pytz.utc)
+    registries = _collect_registries()
+    tasks = ScheduledTask.objects.filter(
+        status__in=NON_TERMINAL_STATUSES,
+        created__lt=now - timedelta(seconds=RECONCILE_GRACE_PERIOD),
+    ).only("pk", "job_id", "status", "message", "fail_reason", "end_time")
+
+    counters = {"checked": 0, "failed": 0, "finished": 0, "orphaned": 0}
+    orphans = []
+    changed = []
+    tasks = list(tasks)
+    # jobs not found in any registry are fetched once more, they might be between registries
+    unseen = [
+        task.job_id
+        for task in tasks
+        if not any(task.job_id in registry for registry in registries.values())
+    ]
+    alive = {
+        job_id
+        for job_id, job in fetch_jobs(unseen).items()
+        if job is not None and job.get_status(refresh=False) in ALIVE_JOB_STATUSES
+    }
+    for task in tasks:
+        counters["checked"] += 1
+        if task.job_id in registries["started"] or task.job_id in registries["pending"] or task.job_id in alive:
+            continue
+        if task.job_id in registries["failed"]:
+            counters["failed"] += 1
+            task.message = "Job failed in RQ: worker was killed or job timeout was reached"
+        elif task.job_id in registries["finished"]:
+            counters["finished"] += 1
+            task.message = "Job was finished in RQ, but task status was not saved"
+        else:
+            counters["orphaned"] += 1
+            orphans.append(task.pk)
+            task.message = "Job was not found in RQ"
+        task.status = TaskStatusChoices.STATUS_FAILED
+        task.fail_reason = TaskFailReasonChoices.FAIL_UNKNOWN
+        task.end_time = now
+        changed.append(task)
+
+    ScheduledTask.objects.bulk_update(
+        changed,
+        fields=["status", "message", "fail_reason", "end_time"],
+        batch_size=1000,
+    )
+    return {**counters, "orphans": orphans}
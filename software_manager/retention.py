@@ -0,0 +1,116 @@
+import gzip
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytz
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+
+from .choices import TaskStatusChoices
+from .models import ScheduledTask, ScheduledTaskArchive
+
+PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get("software_manager", dict())
+# Finished tasks older than this (days, by end time or scheduled time) are purged, None - keep forever
+TASK_RETENTION_DAYS = PLUGIN_SETTINGS.get("TASK_RETENTION_DAYS", 90)
+TASK_RETENTION_STATUSES = PLUGIN_SETTINGS.get(
+    "TASK_RETENTION_STATUSES",
+    [
+        TaskStatusChoices.STATUS_SUCCEEDED,
+        TaskStatusChoices.STATUS_SKIPPED,
+        TaskStatusChoices.STATUS_FAILED,
+    ],
+)
+# Not ACKed tasks are kept, they count for failure threshold and need attention
+TASK_RETENTION_REQUIRE_ACK = PLUGIN_SETTINGS.get("TASK_RETENTION_REQUIRE_ACK", True)
+# "table" - ScheduledTaskArchive with compressed log, "ndjson" - gzipped NDJSON files in TASK_ARCHIVE_DIR,
+# "none" - delete only
+TASK_ARCHIVE_MODE = PLUGIN_SETTINGS.get("TASK_ARCHIVE_MODE", "table")
+TASK_ARCHIVE_DIR = PLUGIN_SETTINGS.get("TASK_ARCHIVE_DIR", str(Path(settings.MEDIA_ROOT, "software-manager-archive")))
+PURGE_CHUNK_SIZE = PLUGIN_SETTINGS.get("PURGE_CHUNK_SIZE", 500)
+
+ARCHIVE_FIELDS = [
+    "id",
+    "device_id",
+    "task_type",
+    "status",
+    "fail_reason",
+    "message",
+    "confirmed",
+    "scheduled_time",
+    "start_time",
+    "end_time",
+    "mw_duration",
+    "user",
+    "transfer_method",
+    "timings",
+    "attempts",
+    "log",
+]
+
+
+def get_expired_tasks(days: int = TASK_RETENTION_DAYS):
+    cutoff = datetime.now().astimezone(pytz.utc) - timedelta(days=int(days))
+    tasks = ScheduledTask.objects.filter(status__in=TASK_RETENTION_STATUSES).filter(
+        Q(end_time__lt=cutoff) | Q(end_time__isnull=True, scheduled_time__lt=cutoff)
+    )
+    if TASK_RETENTION_REQUIRE_ACK:
+        tasks = tasks.filter(confirmed=True)
+    return tasks
+
+
+def _export_ndjson(tasks: list[ScheduledTask], path: Path) -> None:
+    # every chunk is a separate gzip member, file stays readable if purge is interrupted
+    with gzip.open(path, "at", encoding="utf-8") as f:
+        for task in tasks:
+            row = {field: getattr(task, field) for field in ARCHIVE_FIELDS}
+            row["device"] = str(task.device) if task.device_id else None
+            f.write(json.dumps(row, cls=DjangoJSONEncoder) + "\n")
+
+
+# Archives and deletes expired tasks in chunks, each chunk in its own short transaction. Rows locked
+# by someone else (task being updated) are skipped and purged next time.
+def purge_tasks(
+    days: int | None = TASK_RETENTION_DAYS,
+    mode: str = TASK_ARCHIVE_MODE,
+    dry_run: bool = False,
+) -> dict[str, int | str]:
+    summary: dict[str, int | str] = {"purged": 0, "archived": 0, "file": ""}
+    if days is None:
+        return summary
+    expired = get_expired_tasks(days)
+    if dry_run:
+        summary["purged"] = expired.count()
+        return summary
+
+    path = None
+    if mode == "ndjson":
+        Path(TASK_ARCHIVE_DIR).mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().astimezone(pytz.utc).strftime("%Y%m%d-%H%M%S")
+        path = Path(TASK_ARCHIVE_DIR, f"scheduled-tasks-{stamp}.ndjson.gz")
+        summary["file"] = str(path)
+
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            chunk = list(
+                expired.filter(pk__gt=last_pk)
+                .select_related("device")
+                .select_for_update(skip_locked=True, of=("self",))
+                .order_by("pk")[:PURGE_CHUNK_SIZE]
+            )
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+            if mode == "table":
+                ScheduledTaskArchive.objects.bulk_create([ScheduledTaskArchive.from_task(t) for t in chunk])
+                summary["archived"] += len(chunk)
+            elif path is not None:
+                _export_ndjson(chunk, path)
+                summary["archived"] += len(chunk)
+            # jobs of finished tasks are normally expired already, queryset delete removes leftovers in bulk
+            ScheduledTask.objects.filter(pk__in=[t.pk for t in chunk]).delete()
+            summary["purged"] += len(chunk)
+    return summary
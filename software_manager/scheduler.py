@@ -0,0 +1,251 @@
+import heapq
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from statistics import median
+
+import pytz
+
+from dcim.models import Device
+from django.conf import settings
+from rq.worker import Worker
+
+from .choices import TaskFailReasonChoices, TaskStatusChoices, TaskTypeChoices
+from .models import ScheduledTask
+from .queues import delete_jobs, fetch_jobs, get_task_queue, is_job_started
+
+PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get("software_manager", dict())
+# Fallback durations (seconds) for device groups without enough history.
+TASK_DURATION_DEFAULTS = PLUGIN_SETTINGS.get(
+    "TASK_DURATION_DEFAULTS",
+    {
+        TaskTypeChoices.TYPE_UPLOAD: 3600,
+        TaskTypeChoices.TYPE_UPGRADE: 1800,
+        TaskTypeChoices.TYPE_UPLOAD_UPGRADE: 5400,
+    },
+)
+ESTIMATE_HISTORY_SIZE = PLUGIN_SETTINGS.get("ESTIMATE_HISTORY_SIZE", 2000)
+ESTIMATE_MIN_SAMPLES = PLUGIN_SETTINGS.get("ESTIMATE_MIN_SAMPLES", 3)
+JOB_TIMEOUT_FACTOR = PLUGIN_SETTINGS.get("JOB_TIMEOUT_FACTOR", 2)
+JOB_TIMEOUT_MIN = PLUGIN_SETTINGS.get("JOB_TIMEOUT_MIN", 600)
+# Runs of a task with transient failure (device unreachable, no CLI session), 1 - no retries
+TASK_RETRY_MAX_ATTEMPTS = PLUGIN_SETTINGS.get("TASK_RETRY_MAX_ATTEMPTS", 3)
+# First retry delay (seconds), doubled for every next attempt
+TASK_RETRY_BACKOFF = PLUGIN_SETTINGS.get("TASK_RETRY_BACKOFF", 60)
+TASK_RETRY_BACKOFF_MAX = PLUGIN_SETTINGS.get("TASK_RETRY_BACKOFF_MAX", 900)
+
+# Phases recorded by TaskExecutor into ScheduledTask.timings
+TASK_PHASES = ("check", "validate", "upload", "verify", "reload", "post")
+
+
+# Estimates task duration from per-phase timings of succeeded tasks. History is grouped by
+# (device type, transfer method, site) and falls back to wider groups if a group has too few samples.
+class TaskDurationEstimator:
+    def __init__(self, task_type: str) -> None:
+        self.task_type = task_type
+        self.default = TASK_DURATION_DEFAULTS.get(task_type, 3600)
+        # level -> group key -> number of tasks / phase -> list of durations
+        self.samples: list[dict[tuple, int]] = [{}, {}, {}, {}]
+        self.phases: list[dict[tuple, dict[str, list[float]]]] = [{}, {}, {}, {}]
+        self._load()
+
+    @staticmethod
+    def _keys(device_type_id: int | None, transfer_method: str, site_id: int | None) -> list[tuple]:
+        return [
+            (device_type_id, transfer_method, site_id),
+            (device_type_id, transfer_method),
+            (device_type_id,),
+            (),
+        ]
+
+    def _load(self) -> None:
+        rows = (
+            ScheduledTask.objects.filter(
+                task_type=self.task_type,
+                status=TaskStatusChoices.STATUS_SUCCEEDED,
+                device__isnull=False,
+            )
+            .exclude(timings={})
+            .order_by("-end_time")
+            .values_list("device__device_type_id", "transfer_method", "device__site_id", "timings")[
+                :ESTIMATE_HISTORY_SIZE
+            ]
+        )
+        for device_type_id, transfer_method, site_id, timings in rows:
+            for level, key in enumerate(self._keys(device_type_id, transfer_method, site_id)):
+                self.samples[level][key] = self.samples[level].get(key, 0) + 1
+                phases = self.phases[level].setdefault(key, {})
+                for phase in TASK_PHASES:
+                    if phase in timings:
+                        phases.setdefault(phase, []).append(float(timings[phase]))
+
+    def estimate(self, device: Device, transfer_method: str) -> int:
+        for level, key in enumerate(self._keys(device.device_type_id, transfer_method, device.site_id)):
+            if self.samples[level].get(key, 0) < ESTIMATE_MIN_SAMPLES:
+                continue
+            phases = self.phases[level][key]
+            # Median of each phase over tasks where the phase happened, e.g. the copy is taken into account
+            # even if some devices already had the image. Pessimistic, but the plan should not overbook MW.
+            return int(sum(median(durations) for durations in phases.values())) or self.default
+        return self.default
+
+
+@dataclass(frozen=True)
+class PlannedTask:
+    device: Device
+    estimate: int
+    start: int
+    finish: int
+    fits: bool
+
+
+@dataclass(frozen=True)
+class BatchPlan:
+    tasks: list[PlannedTask]
+    workers: int
+    window: int
+
+    @property
+    def makespan(self) -> int:
+        return max((t.finish for t in self.tasks if t.fits), default=0)
+
+    @property
+    def overflow(self) -> list[PlannedTask]:
+        return [t for t in self.tasks if not t.fits]
+
+
+def get_worker_count(task_type: str) -> int:
+    queue = get_task_queue(task_type)
+    return Worker.count(connection=queue.connection, queue=queue) or 1
+
+
+# Orders tasks so the most work completes inside MW: longest tasks first, each assigned to the
+# earliest free worker (LPT). Tasks that would finish after MW end are moved to the end of the order.
+def plan_batch(devices: list[Device], task_type: str, transfer_method: str, mw_duration: int) -> BatchPlan:
+    estimator = TaskDurationEstimator(task_type)
+    workers = get_worker_count(task_type)
+    window = int(mw_duration) * 3600
+
+    estimates = sorted(
+        ((estimator.estimate(device, transfer_method), device) for device in devices),
+        key=lambda x: x[0],
+        reverse=True,
+    )
+    lanes = [0] * workers
+    planned = []
+    overflow = []
+    for estimate, device in estimates:
+        start = lanes[0]
+        if start + estimate > window:
+            overflow.append(PlannedTask(device, estimate, start, start + estimate, False))
+            continue
+        heapq.heapreplace(lanes, start + estimate)
+        planned.append(PlannedTask(device, estimate, start, start + estimate, True))
+
+    # Tasks out of MW are still submitted (they are skipped by MW check if not started in time),
+    # shortest first as they have the best chance to start.
+    overflow.sort(key=lambda x: x.estimate)
+    return BatchPlan(tasks=planned + overflow, workers=workers, window=window)
+
+
+def get_job_timeout(estimate: int, mw_duration: int) -> int:
+    return max(JOB_TIMEOUT_MIN, min(int(estimate * JOB_TIMEOUT_FACTOR), int(mw_duration) * 3600))
+
+
+# Exponential backoff with jitter, so devices behind the same flapping link/AAA do not retry at once
+def get_retry_delay(attempt: int) -> int:
+    delay = min(TASK_RETRY_BACKOFF * 2 ** max(attempt - 1, 0), TASK_RETRY_BACKOFF_MAX)
+    return int(delay / 2 + random.uniform(0, delay / 2))
+
+
+# Enqueues the task again after transient failure. Returns delay in seconds or None if attempts are
+# exhausted or the task is not expected to be completed inside MW any more.
+def schedule_retry(task: ScheduledTask) -> int | None:
+    if task.attempts >= TASK_RETRY_MAX_ATTEMPTS or not all([task.scheduled_time, task.mw_duration]):
+        return None
+    delay = get_retry_delay(task.attempts)
+    now = datetime.now().replace(microsecond=0).astimezone(pytz.utc)
+    mw_end = task.scheduled_time + timedelta(hours=int(task.mw_duration))
+    if now + timedelta(seconds=delay + (task.estimated_duration or 0)) > mw_end:
+        return None
+
+    job = get_task_queue(task.task_type).enqueue_in(
+        timedelta(seconds=delay),
+        "software_manager.worker.upgrade_device",
+        args=[task.pk],
+        job_timeout=get_job_timeout(task.estimated_duration or 0, task.mw_duration),
+    )
+    task.job_id = job.id
+    task.status = TaskStatusChoices.STATUS_SCHEDULED
+    task.message = f"Retry {task.attempts + 1}/{TASK_RETRY_MAX_ATTEMPTS} in {delay} seconds: {task.message}"[:512]
+    # task is not failed while it waits for the next attempt, default value is "no reason"
+    task.fail_reason = TaskFailReasonChoices.FAIL_UNKNOWN
+    # phase durations of failed attempt would inflate duration estimates
+    task.timings = {}
+    # not started task is not counted as not ACKed by failure threshold
+    task.start_time = None
+    task.end_time = None
+    task.save()
+    return delay
+
+
+def _merge_task_types(first: str, second: str) -> str:
+    if first == second:
+        return first
+    return TaskTypeChoices.TYPE_UPLOAD_UPGRADE
+
+
+def _covers(existing: str, new: str) -> bool:
+    return existing == new or existing == TaskTypeChoices.TYPE_UPLOAD_UPGRADE
+
+
+# Checks new tasks against tasks which are scheduled, but not started yet, for the same devices in
+# overlapping MW. Task of the same type is a duplicate and is not created. Upload and upgrade are
+# coalesced into one upload+upgrade task, so the device is connected and validated only once.
+# Returns devices grouped by task type to create, duplicated devices and coalesced (cancelled) tasks.
+def coalesce_tasks(
+    devices: list[Device],
+    task_type: str,
+    scheduled_time: datetime,
+    mw_duration: int,
+) -> tuple[dict[str, list[Device]], list[Device], list[ScheduledTask]]:
+    window_end = scheduled_time + timedelta(hours=int(mw_duration))
+    pending: dict[int, list[ScheduledTask]] = {}
+    for task in ScheduledTask.objects.filter(
+        device__in=devices,
+        status=TaskStatusChoices.STATUS_SCHEDULED,
+        start_time__isnull=True,
+        scheduled_time__lt=window_end,
+    ):
+        if task.scheduled_time + timedelta(hours=int(task.mw_duration or 0)) > scheduled_time:
+            pending.setdefault(task.device_id, []).append(task)
+
+    jobs = fetch_jobs(task.job_id for tasks in pending.values() for task in tasks)
+    batches: dict[str, list[Device]] = {}
+    duplicates = []
+    coalesced = []
+    for device in devices:
+        effective = task_type
+        absorbed = []
+        for task in pending.get(device.pk, []):
+            if _covers(task.task_type, effective):
+                duplicates.append(device)
+                break
+            job = jobs.get(task.job_id)
+            if is_job_started(job):
+                # too late to coalesce, device lock serializes both tasks
+                continue
+            absorbed.append((task, job))
+            effective = _merge_task_types(effective, task.task_type)
+        else:
+            delete_jobs(job for _, job in absorbed if job is not None)
+            for task, _ in absorbed:
+                task.status = TaskStatusChoices.STATUS_SKIPPED
+                task.fail_reason = TaskFailReasonChoices.FAIL_ADD
+                task.message = f"Coalesced into new '{effective}' task scheduled at {scheduled_time}"
+                task.confirmed = True
+                task.end_time = datetime.now().replace(microsecond=0).astimezone(pytz.utc)
+                task.save()
+                coalesced.append(task)
+            batches.setdefault(effective, []).append(device)
+    return batches, duplicates, coalesced
@@ -0,0 +1,70 @@
+import time
+from typing import BinaryIO, Callable
+
+from django.conf import settings
+
+from .hashing import HASH_BUFFER_SIZE
+
+PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get("software_manager", dict())
+# Bytes per second per device, 0 - no limit
+SCP_RATE_LIMIT = PLUGIN_SETTINGS.get("SCP_RATE_LIMIT", 0)
+# Progress is reported every N percent
+SCP_PROGRESS_STEP = PLUGIN_SETTINGS.get("SCP_PROGRESS_STEP", 10)
+SCP_CHUNK_SIZE = 256 * 1024
+SCP_TIMEOUT = 300
+
+
+class SCPError(Exception):
+    pass
+
+
+def _check_ack(channel) -> None:
+    ack = channel.recv(1)
+    if ack == b"\x00":
+        return
+    message = ack[1:] if len(ack) > 1 else b""
+    if ack in (b"\x01", b"\x02"):
+        message = channel.recv(1024)
+    raise SCPError(f"device rejected transfer: {(ack + message).decode(errors='replace').strip() or 'no response'}")
+
+
+# Sink side of SCP protocol ("scp -t") on a new channel of already authenticated SSH transport, so
+# no second login is needed. Device must have "ip scp server enable".
+def scp_push(
+    transport,
+    source: BinaryIO,
+    size: int,
+    remote_path: str,
+    rate_limit: int = SCP_RATE_LIMIT,
+    progress: Callable[[int, int], None] | None = None,
+) -> float:
+    filename = remote_path.rsplit("/", 1)[-1].rsplit(":", 1)[-1]
+    channel = transport.open_session()
+    channel.settimeout(SCP_TIMEOUT)
+    started = time.monotonic()
+    try:
+        channel.exec_command(f"scp -t {remote_path}")
+        _check_ack(channel)
+        channel.sendall(f"C0644 {size} {filename}\n".encode())
+        _check_ack(channel)
+
+        sent = 0
+        next_report = SCP_PROGRESS_STEP
+        while data := source.read(min(SCP_CHUNK_SIZE, HASH_BUFFER_SIZE)):
+            channel.sendall(data)
+            sent += len(data)
+            if rate_limit:
+                # sleep until the average rate is back under the limit
+                ahead = sent / rate_limit - (time.monotonic() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+            if progress is not None and size and sent * 100 >= next_report * size:
+                progress(sent, size)
+                next_report += SCP_PROGRESS_STEP
+        if sent != size:
+            raise SCPError(f"source ended after {sent} of {size} bytes")
+        channel.sendall(b"\x00")
+        _check_ack(channel)
+    finally:
+        channel.close()
+    return time.monotonic() - started
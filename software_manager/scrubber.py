@@ -0,0 +1,91 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import pytz
+from django.conf import settings
+
+from .choices import ImageIntegrityChoices
+from .hashing import hash_file, hash_fileobj
+from .models import SoftwareImage
+from .storage import get_image_storage, is_local_storage
+
+PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get("software_manager", dict())
+SCRUB_WORKERS = PLUGIN_SETTINGS.get("SCRUB_WORKERS", None)
+
+SCRUB_FIELDS = [
+    "md5sum_calculated",
+    "sha256sum",
+    "sha512sum",
+    "image_size",
+    "image_mtime",
+    "image_inode",
+    "integrity_status",
+    "scrubbed_time",
+]
+
+
+# Runs in a pool process
+def _hash_stored_image(name: str) -> dict[str, str]:
+    storage = get_image_storage()
+    if is_local_storage():
+        return hash_file(storage.path(name))
+    with storage.open(name, "rb") as f:
+        return hash_fileobj(f)
+
+
+# Walks all image files. Files with the same size/mtime/inode as stored on last check are skipped,
+# changed files are hashed in a process pool (hashing is CPU bound for several hundred MB images).
+def scrub_images(force: bool = False, workers: int | None = SCRUB_WORKERS) -> dict[str, int | list[str]]:
+    now = datetime.now().replace(microsecond=0).astimezone(pytz.utc)
+    counters = {"checked": 0, "skipped": 0, "ok": 0, "mismatch": 0, "missing": 0}
+    flagged = []
+    changed = []
+    to_hash = []
+
+    for sw in SoftwareImage.objects.exclude(image="").exclude(image__isnull=True).only("pk", "image", *SCRUB_FIELDS):
+        counters["checked"] += 1
+        stat = sw._stat_image()
+        if not is_local_storage():
+            # no cheap fingerprint for objects, they are downloaded and hashed on force only
+            if not sw.image.storage.exists(sw.image.name):
+                stat = None
+            elif force:
+                to_hash.append((sw, None))
+                continue
+            else:
+                counters["skipped"] += 1
+                continue
+        if stat is None:
+            counters["missing"] += 1
+            flagged.append(str(sw))
+            sw.integrity_status = ImageIntegrityChoices.INTEGRITY_MISSING
+            sw.scrubbed_time = now
+            changed.append(sw)
+        elif not force and sw.integrity_status == ImageIntegrityChoices.INTEGRITY_OK and sw._fingerprint_matches(stat):
+            counters["skipped"] += 1
+        else:
+            to_hash.append((sw, stat))
+
+    if to_hash:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = {pool.submit(_hash_stored_image, sw.image.name): (sw, stat) for sw, stat in to_hash}
+            for future in as_completed(futures):
+                sw, stat = futures[future]
+                try:
+                    hashes = future.result()
+                except OSError:
+                    sw.integrity_status = ImageIntegrityChoices.INTEGRITY_MISSING
+                else:
+                    sw.apply_integrity_check(stat, hashes)
+                sw.scrubbed_time = now
+                changed.append(sw)
+                if sw.integrity_failed:
+                    counters[sw.integrity_status] += 1
+                    flagged.append(str(sw))
+                else:
+                    counters["ok"] += 1
+
+    # bulk_update does not call save(), so files are not hashed once again
+    SoftwareImage.objects.bulk_update(changed, fields=SCRUB_FIELDS, batch_size=500)
+    return {**counters, "flagged": flagged}
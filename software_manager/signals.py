@@ -0,0 +1,41 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django_rq import get_queue
+
+from .models import GoldenImage, SoftwareImage
+from .publisher import enqueue_publish, get_file_servers
+
+
+@receiver(post_save, sender=GoldenImage)
+def publish_golden_image(sender, instance: GoldenImage, **kwargs) -> None:
+    if instance.sw is None or not instance.sw.image_exists or not get_file_servers():
+        return
+    # job must see committed GoldenImage/SoftwareImage
+    transaction.on_commit(lambda: enqueue_publish(instance.sw))
+
+
+def enqueue_compliance_refresh(device_types: list[int]) -> None:
+    if not device_types:
+        return
+    # device type can have thousands of devices, rows are rebuilt outside of the request
+    transaction.on_commit(
+        lambda: get_queue("default").enqueue(
+            "software_manager.compliance.refresh_compliance",
+            device_types=device_types,
+        )
+    )
+
+
+@receiver(post_save, sender=GoldenImage)
+@receiver(post_delete, sender=GoldenImage)
+def invalidate_golden_image_compliance(sender, instance: GoldenImage, **kwargs) -> None:
+    enqueue_compliance_refresh([instance.pid_id])
+
+
+@receiver(post_save, sender=SoftwareImage)
+def invalidate_software_image_compliance(sender, instance: SoftwareImage, created: bool, **kwargs) -> None:
+    if created:
+        return
+    # version of a golden image could be changed
+    enqueue_compliance_refresh(list(GoldenImage.objects.filter(sw=instance).values_list("pid_id", flat=True)))
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import re
+from dataclasses import dataclass
+
+from django.conf import settings
+
+try:
+    from pysnmp.hlapi.asyncio import (
+        CommunityData,
+        ContextData,
+        ObjectIdentity,
+        ObjectType,
+        SnmpEngine,
+        UdpTransportTarget,
+        getCmd,
+    )
+except ImportError as e:
+    getCmd = None
+    _import_error = str(e)
+
+PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get("software_manager", dict())
+# Version and reachability are read with SNMP GET first (requires pysnmp), SSH is fallback
+SNMP_ENABLED = PLUGIN_SETTINGS.get("SNMP_ENABLED", False)
+SNMP_COMMUNITY = PLUGIN_SETTINGS.get("SNMP_COMMUNITY", "public")
+SNMP_PORT = PLUGIN_SETTINGS.get("SNMP_PORT", 161)
+SNMP_TIMEOUT = PLUGIN_SETTINGS.get("SNMP_TIMEOUT", 2)
+SNMP_RETRIES = PLUGIN_SETTINGS.get("SNMP_RETRIES", 1)
+# Requests in flight at the same time from one process
+SNMP_CONCURRENCY = PLUGIN_SETTINGS.get("SNMP_CONCURRENCY", 500)
+
+log = logging.getLogger("upgrade")
+_warned = False
+
+OID_SYS_DESCR = "1.3.6.1.2.1.1.1.0"
+OID_SYS_UPTIME = "1.3.6.1.2.1.1.3.0"
+
+# "Cisco IOS Software [Amsterdam], ... (CAT9K_IOSXE), Version 17.3.4, RELEASE SOFTWARE (fc3)"
+SYS_DESCR_VERSION = re.compile(r"Version\s+([^\s,]+)")
+
+
+@dataclass(frozen=True)
+class SnmpStatus:
+    sys_descr: str
+    uptime: int
+
+    @property
+    def version(self) -> str:
+        if match := SYS_DESCR_VERSION.search(self.sys_descr):
+            return match.group(1)
+        return ""
+
+
+def is_snmp_enabled() -> bool:
+    global _warned
+    if SNMP_ENABLED and getCmd is None and not _warned:
+        log.warning(f"SNMP_ENABLED is set, but pysnmp asyncio API is not available ({_import_error}), SSH is used")
+        _warned = True
+    return bool(SNMP_ENABLED) and getCmd is not None
+
+
+async def _get_status(engine, host: str) -> SnmpStatus | None:
+    error_indication, error_status, _, var_binds = await getCmd(
+        engine,
+        CommunityData(SNMP_COMMUNITY, mpModel=1),
+        UdpTransportTarget((host, SNMP_PORT), timeout=SNMP_TIMEOUT, retries=SNMP_RETRIES),
+        ContextData(),
+        ObjectType(ObjectIdentity(OID_SYS_DESCR)),
+        ObjectType(ObjectIdentity(OID_SYS_UPTIME)),
+    )
+    if error_indication or error_status:
+        return None
+    sys_descr, uptime = (value for _, value in var_binds)
+    # sysUpTime is in hundredths of a second
+    return SnmpStatus(sys_descr=str(sys_descr), uptime=int(uptime) // 100)
+
+
+async def _poll(hosts: list[str]) -> dict[str, SnmpStatus | None]:
+    # one engine and one UDP socket for all requests, concurrency is limited by semaphore only
+    engine = SnmpEngine()
+    semaphore = asyncio.Semaphore(SNMP_CONCURRENCY)
+
+    async def poll(host: str) -> tuple[str, SnmpStatus | None]:
+        async with semaphore:
+            try:
+                return host, await _get_status(engine, host)
+            except Exception as e:
+                # not a timeout (reported as errorIndication), most likely pysnmp API mismatch
+                log.warning(f"SNMP request to {host} failed: {e.__class__.__name__}: {e}")
+                return host, None
+
+    try:
+        return dict(await asyncio.gather(*(poll(host) for host in hosts)))
+    finally:
+        if engine.transportDispatcher is not None:
+            engine.transportDispatcher.closeDispatcher()
+
+
+# Returns {host: status}, status is None if host did not answer or SNMP is disabled
+def poll_devices(hosts: list[str]) -> dict[str, SnmpStatus | None]:
+    if not is_snmp_enabled() or not hosts:
+        return {host: None for host in hosts}
+    return asyncio.run(_poll(list(dict.fromkeys(hosts))))
+
+
+def poll_device(host: str) -> SnmpStatus | None:
+    return poll_devices([host])[host]
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, Storage, default_storage
+from django.utils.module_loading import import_string
+
+PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get("software_manager", dict())
+# Storage for SoftwareImage.image, NetBox media storage if not set. S3-compatible storage (AWS, MinIO)
+# via django-storages: {"BACKEND": "storages.backends.s3.S3Storage", "OPTIONS": {"bucket_name": ...}}
+IMAGE_STORAGE = PLUGIN_SETTINGS.get("IMAGE_STORAGE", None)
+# Lifetime (seconds) of presigned URL given to a device for HTTP copy, should cover the whole copy
+PRESIGNED_URL_EXPIRY = PLUGIN_SETTINGS.get("PRESIGNED_URL_EXPIRY", 4 * 3600)
+
+_image_storage: Storage | None = None
+
+
+# Callable storage of FileField, backend is not written into migrations
+def get_image_storage() -> Storage:
+    global _image_storage
+    if _image_storage is None:
+        if IMAGE_STORAGE:
+            backend = import_string(IMAGE_STORAGE["BACKEND"])
+            _image_storage = backend(**IMAGE_STORAGE.get("OPTIONS", {}))
+        else:
+            _image_storage = default_storage
+    return _image_storage
+
+
+def is_local_storage() -> bool:
+    storage = get_image_storage()
+    # default_storage is a lazy object, isinstance is resolved through it
+    return isinstance(storage, FileSystemStorage)
+
+
+def get_image_url(name: str) -> str:
+    # time-limited URL devices can download from directly (S3 presigned GET)
+    return get_image_storage().url(name, expire=PRESIGNED_URL_EXPIRY)
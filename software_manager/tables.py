@@ -25,7 +25,9 @@ SW_LIST_SIZE = """
 """
 
 SW_LIST_MD5SUM = """
-{% if record.md5sum == record.md5sum_calculated %}
+{% if record.integrity_failed %}
+    <span class="badge bg-danger" style="font-size: small; font-family: monospace" title="Image file integrity: {{ record.integrity_status }}">{{ record.md5sum|default:"&mdash;" }}</span>
+{% elif record.md5sum == record.md5sum_calculated %}
     <span class="badge bg-success" style="font-size: small; font-family: monospace">{{ record.md5sum }}</span>
 {% else %}
     <span class="badge bg-danger" style="font-size: small; font-family: monospace">{{ record.md5sum|default:"&mdash;" }}</span>
@@ -67,7 +69,9 @@ GOLDEN_IMAGE_ACTION = """
 """
 
 GOLDEN_IMAGE_MD5SUM = """
-{% if record.golden_image.sw.md5sum == record.golden_image.sw.md5sum_calculated %}
+{% if record.golden_image.sw.integrity_failed %}
+    <span class="badge bg-danger" style="font-size: small; font-family: monospace" title="Image file integrity: {{ record.golden_image.sw.integrity_status }}">{{ record.golden_image.sw.md5sum|default:"&mdash;" }}</span>
+{% elif record.golden_image.sw.md5sum == record.golden_image.sw.md5sum_calculated %}
     <span class="badge bg-success" style="font-size: small; font-family: monospace">{{ record.golden_image.sw.md5sum }}</span>
 {% else %}
     <span class="badge bg-danger" style="font-size: small; font-family: monospace">{{ record.golden_image.sw.md5sum|default:"&mdash;" }}</span>
@@ -76,8 +80,8 @@ GOLDEN_IMAGE_MD5SUM = """
 
 GOLDEN_IMAGE_PROGRESS_GRAPH = """
 {% if record.golden_image %}
-    {% if record.instances.count %}
-        {% progress_graph record.golden_image.get_progress %}
+    {% if record.instance_total %}
+        {% progress_graph record.progress %}
     {% else %}
         No instances
     {% endif %}
@@ -86,16 +90,17 @@ GOLDEN_IMAGE_PROGRESS_GRAPH = """
 {% endif %}
 """
 
+# versions and compliant flag are read from DeviceCompliance, the same rule as compliance filter
 UPGRADE_TARGET_SOFTWARE = """
-{{ record.device_type.golden_image.sw.version|default:"&mdash;" }}
+{{ record.compliance.target_version|default:"&mdash;" }}
 """
 
 UPGRADE_CURRENT_SOFTWARE = """
-{% if record|get_current_version %}
-    {% if record|get_current_version == record.device_type.golden_image.sw.version %}
-        <span class="badge bg-success">{{ record|get_current_version }}</span>
+{% if record.compliance.current_version %}
+    {% if record.compliance.compliant %}
+        <span class="badge bg-success">{{ record.compliance.current_version }}</span>
     {% else %}
-        <span class="badge bg-warning">{{ record|get_current_version }}</span>
+        <span class="badge bg-warning">{{ record.compliance.current_version }}</span>
     {% endif %}
 {% else %}
     &mdash;
@@ -111,6 +116,8 @@ SCHEDULED_TASK_TYPE = """
     <span class="badge bg-info">Upload</span>
 {% elif record.task_type == 'upgrade' %}
     <span class="badge bg-primary">Upgrade</span>
+{% elif record.task_type == 'upload-upgrade' %}
+    <span class="badge bg-primary">Upload+Upgrade</span>
 {% else %}
     <span class="badge bg-secondary">Unknown</span>
 {% endif %}
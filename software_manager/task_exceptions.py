@@ -1,8 +1,10 @@
 class TaskException(Exception):
-    def __init__(self, reason, message, **kwargs):
+    def __init__(self, reason, message, retryable=False, **kwargs):
         super().__init__(kwargs)
         self.reason = reason
         self.message = message
+        # transient failure, task can be run again inside MW
+        self.retryable = retryable
 
     def __str__(self):
         return f"{self.__class__.__name__}: {self.reason}: {self.message}"
@@ -1,26 +1,35 @@
 import re
 import socket
 import time
+from contextlib import contextmanager
 from datetime import timedelta
 from functools import wraps
-from pathlib import Path
-from typing import Callable
+from typing import Callable, Iterator
 
 from django.conf import settings
-from django_rq import get_queue
 from scrapli.driver.core import IOSXEDriver
 from scrapli.exceptions import ScrapliAuthenticationFailed, ScrapliConnectionError, ScrapliTimeout
 from scrapli.response import MultiResponse, Response
 
 from .choices import TaskFailReasonChoices, TaskStatusChoices, TaskTransferMethod, TaskTypeChoices
+from .compliance import update_device_compliance
+from .context import build_task_context, release_db_connections
+from .events import BOOT_EVENT_TIMEOUT, BOOT_EVENTS, wait_for_boot
+from .locks import DeviceLease
 from .logger import TaskLoggerMixIn
 from .models import ScheduledTask
+from .peers import PEER_DISTRIBUTION, forget_staged, get_peer_candidates, is_ssh_open, peer_slot, record_staged
+from .probe import probe_image_cached
+from .publisher import get_unpublished_servers
+from .queues import get_task_queues
+from .scp import scp_push
+from .snmp import poll_device
+from .storage import get_image_url, is_local_storage
 from .task_exceptions import TaskException
 
 PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get("software_manager", dict())
 DEVICE_USERNAME = PLUGIN_SETTINGS.get("DEVICE_USERNAME", "")
 DEVICE_PASSWORD = PLUGIN_SETTINGS.get("DEVICE_PASSWORD", "")
-UPGRADE_QUEUE = PLUGIN_SETTINGS.get("UPGRADE_QUEUE", "")
 UPGRADE_THRESHOLD = PLUGIN_SETTINGS.get("UPGRADE_THRESHOLD", 2)
 FTP_USERNAME = PLUGIN_SETTINGS.get("FTP_USERNAME", "")
 FTP_PASSWORD = PLUGIN_SETTINGS.get("FTP_PASSWORD", "")
@@ -50,17 +59,30 @@ class TaskExecutor(TaskLoggerMixIn):
                 ],
             },
         }
-        if self.task.device is not None and self.task.device.primary_ip is not None:
-            self.scrapli["host"] = str(self.task.device.primary_ip.address.ip)
-        else:
-            self.scrapli["host"] = None
+        # device, golden image and file facts are read once, executor does not walk relations later
+        self.ctx = build_task_context(task)
+        self.scrapli["host"] = self.ctx.host
 
         self.file_system = None
         self.target_image = None
         self.image_on_device = None
+        self.image_verified = False
         self.total_free = 0
+        self.lease = None
+        self.reload_requested = False
+        self.boot_event = None
+
+    @contextmanager
+    def _timed(self, phase: str) -> Iterator[None]:
+        # Phase durations are used by scheduler.TaskDurationEstimator for next batches
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self.task.timings[phase] = round(self.task.timings.get(phase, 0) + elapsed, 1)
 
-    def _action_task(self, status: str, msg: str, reason: str) -> None:
+    def _action_task(self, status: str, msg: str, reason: str, retryable: bool = False) -> None:
         self.task.status = status
         self.task.message = msg
         self.task.fail_reason = reason
@@ -68,11 +90,12 @@ class TaskExecutor(TaskLoggerMixIn):
         raise TaskException(
             reason=reason,
             message=msg,
+            retryable=retryable,
         )
 
-    def skip_task(self, msg: str = "", reason: str = "") -> None:
+    def skip_task(self, msg: str = "", reason: str = "", retryable: bool = False) -> None:
         self._close_cli()
-        self._action_task(TaskStatusChoices.STATUS_SKIPPED, msg, reason)
+        self._action_task(TaskStatusChoices.STATUS_SKIPPED, msg, reason, retryable)
 
     def drop_task(self, msg: str = "", reason: str = "") -> None:
         self._close_cli()
@@ -89,38 +112,59 @@ class TaskExecutor(TaskLoggerMixIn):
     def _check_primary_ip_exists(self) -> None:
         if self.task.device is None:
             return
-        if self.task.device.primary_ip is None:
+        if self.ctx.host is None:
             msg = "_check_primary_ip_exists - FAIL: No primary (mgmt) address"
             self.warning(msg)
             self.skip_task(msg, TaskFailReasonChoices.FAIL_CHECK)
         else:
-            ip = str(self.task.device.primary_ip.address.ip)
+            ip = self.ctx.host
             self.debug(f"_check_primary_ip_exists - OK: {ip=}")
 
+    def _check_device_is_not_locked(self) -> None:
+        if self.task.device is None:
+            return
+        self.lease = DeviceLease(self.task.device.pk, owner=self.task.job_id)
+        if not self.lease.acquire():
+            msg = f"_check_device_is_not_locked - FAIL: Device is locked by another task, job id '{self.lease.holder}'"
+            self.lease = None
+            self.warning(msg)
+            self.skip_task(msg, TaskFailReasonChoices.FAIL_CHECK)
+        self.debug("_check_device_is_not_locked - OK: Device lock was acquired")
+
+    def _release_device_lock(self) -> None:
+        if self.lease is None:
+            return
+        if self.lease.lost:
+            self.warning("Device lock was lost during task execution")
+        self.lease.release()
+        self.lease = None
+
     def _check_golden_image_is_set(self) -> None:
         if self.task.device is None:
             return
-        device_type = self.task.device.device_type
-        if not hasattr(device_type, "golden_image"):
+        device_type = self.ctx.device_type
+        if self.ctx.golden_image is None or self.ctx.sw is None:
             msg = f"_check_golden_image_is_set - FAIL: No Golden Image for '{device_type.model}'"
             self.warning(msg)
             self.skip_task(msg, TaskFailReasonChoices.FAIL_CHECK)
-        self.debug(
-            f"_check_golden_image_is_set - OK: Golden Image for '{device_type.model}' is '{device_type.golden_image.sw}'"
-        )
+        self.debug(f"_check_golden_image_is_set - OK: Golden Image for '{device_type.model}' is '{self.ctx.sw}'")
 
     def _check_software_image_file_exists(self) -> None:
         if self.task.device is None:
             return
-        sw = self.task.device.device_type.golden_image.sw
+        sw = self.ctx.sw
 
         if not sw.image_exists:
             msg = "_check_software_image_file_exists - OK: SoftwareImage was created without file, no need to check"
             self.warning(msg)
             return
 
-        if not Path(settings.MEDIA_ROOT, sw.image.name).is_file():
-            msg = "_check_software_image_file_exists - FAIL: Image file does not exist in NetBox media directory"
+        if not sw.image.storage.exists(sw.image.name):
+            msg = "_check_software_image_file_exists - FAIL: Image file does not exist in image storage"
+            self.warning(msg)
+            self.skip_task(msg, TaskFailReasonChoices.FAIL_CHECK)
+        if sw.integrity_failed:
+            msg = f"_check_software_image_file_exists - FAIL: Image file integrity check failed: {sw.integrity_status}"
             self.warning(msg)
             self.skip_task(msg, TaskFailReasonChoices.FAIL_CHECK)
         self.debug("_check_software_image_file_exists - OK: Image file exists in NetBox media directory")
@@ -136,14 +180,35 @@ class TaskExecutor(TaskLoggerMixIn):
             self.skip_task(msg, TaskFailReasonChoices.FAIL_CHECK)
         self.debug("_check_mw_is_active - OK: Maintenance Window is still active")
 
+    # Runs before device login. With peer distribution it runs right before the copy from central server
+    # instead (configs_undo is set), devices which get the image from a peer do not depend on file server.
+    def _check_file_server(self, configs_undo: list[str] | None = None) -> None:
+        if self.task.task_type not in (TaskTypeChoices.TYPE_UPLOAD, TaskTypeChoices.TYPE_UPLOAD_UPGRADE):
+            return
+        sw = self.ctx.sw
+        if not sw.image_exists:
+            return
+        ok, message = probe_image_cached(
+            sw,
+            self.task.transfer_method,
+            batch_time=self.task.scheduled_time,
+            ttl=int(self.task.mw_duration) * 3600,
+        )
+        if not ok:
+            if configs_undo is not None:
+                self._rollback_copy_configs(configs_undo)
+            msg = f"_check_file_server - FAIL: {message}"
+            self.warning(msg)
+            self.skip_task(msg, TaskFailReasonChoices.FAIL_UPLOAD)
+        self.debug(f"_check_file_server - OK: {message}")
+
     def _check_failure_theshold(self) -> None:
         if UPGRADE_THRESHOLD is None:
             msg = "_check_failure_theshold - FAIL: UPGRADE_THRESHOLD is not set"
             self.warning(msg)
             self.skip_task(msg, TaskFailReasonChoices.FAIL_CHECK)
-        if self.task.task_type == TaskTypeChoices.TYPE_UPGRADE:
-            queue = get_queue(UPGRADE_QUEUE)
-            active_jobs = queue.started_job_registry.count
+        if self.task.task_type in (TaskTypeChoices.TYPE_UPGRADE, TaskTypeChoices.TYPE_UPLOAD_UPGRADE):
+            active_jobs = sum(queue.started_job_registry.count for queue in get_task_queues())
             non_ack = ScheduledTask.objects.filter(start_time__isnull=False, confirmed=False).count()
             if non_ack >= active_jobs + UPGRADE_THRESHOLD:
                 msg = (
@@ -162,7 +227,11 @@ class TaskExecutor(TaskLoggerMixIn):
             self.debug(f"_check_failure_theshold - OK: Task type is '{self.task.task_type}', no need to check")
 
     def _check_device_is_alive(self) -> None:
-        if self.task.device is None or self.task.device.primary_ip is None:
+        if self.ctx.host is None:
+            return
+        if (status := poll_device(self.ctx.host)) is not None:
+            msg = f"_check_device_is_alive - OK: device answers SNMP, version '{status.version}', uptime {status.uptime}s"
+            self.debug(msg)
             return
         if (port := self._is_alive()) is not None:
             msg = f"_check_device_is_alive - OK: device is reachable via TCP/{port}"
@@ -170,7 +239,7 @@ class TaskExecutor(TaskLoggerMixIn):
         else:
             msg = "_check_device_is_alive - FAIL: device is not reachable"
             self.warning(msg)
-            self.skip_task(msg, TaskFailReasonChoices.FAIL_CHECK)
+            self.skip_task(msg, TaskFailReasonChoices.FAIL_CHECK, retryable=True)
 
     def _is_port_open(self, port: int) -> bool:
         try:
@@ -239,7 +308,8 @@ class TaskExecutor(TaskLoggerMixIn):
             if self.cli is None:
                 msg = "_check_cli_is_active - FAIL: Cannot establish cli session"
                 self.warning(msg)
-                self.skip_task(msg, TaskFailReasonChoices.FAIL_CONNECT)
+                # once reload is requested the task is not run from the beginning again
+                self.skip_task(msg, TaskFailReasonChoices.FAIL_CONNECT, retryable=not self.reload_requested)
 
             return func(self, *args, **kwargs)
 
@@ -344,7 +414,7 @@ class TaskExecutor(TaskLoggerMixIn):
     def _validate_image_file(self, dir_all_output: Response) -> None:
         if self.task.device is None:
             return
-        if not self.task.device.device_type.golden_image.sw.image_exists:
+        if not self.ctx.sw.image_exists:
             self.debug(f"SoftwareImage was created without file, no need to validate against device files")
             return
 
@@ -356,8 +426,8 @@ class TaskExecutor(TaskLoggerMixIn):
 
         self.file_system = device_files[0]["file_system"].strip("/")
         self.total_free = int(device_files[0]["total_free"])
-        self.target_image = self.task.device.device_type.golden_image.sw.filename
-        target_path = self.task.device.device_type.golden_image.sw.image.path
+        self.target_image = self.ctx.sw.filename
+        target_path = self.ctx.sw.image.name
         self.image_on_device = list(filter(lambda x: x["name"] == self.target_image, device_files))
 
         self.debug(f"Filesystem: {self.file_system}")
@@ -382,11 +452,14 @@ class TaskExecutor(TaskLoggerMixIn):
     def _initial_check(self) -> None:
         self.info("Initial checking...")
         self._check_device_exists()
+        self._check_device_is_not_locked()
         self._check_primary_ip_exists()
         self._check_golden_image_is_set()
         self._check_software_image_file_exists()
         self._check_mw_is_active()
         self._check_failure_theshold()
+        if not PEER_DISTRIBUTION:
+            self._check_file_server()
         self._check_device_is_alive()
         self.info("Initial checks have been completed")
 
@@ -396,7 +469,10 @@ class TaskExecutor(TaskLoggerMixIn):
         if self.task.transfer_method == TaskTransferMethod.METHOD_FTP:
             cmd_copy = f"copy ftp://{FTP_USERNAME}:{FTP_PASSWORD}@{FTP_SERVER}/{self.target_image} {self.file_system}/{self.target_image}"
         elif self.task.transfer_method == TaskTransferMethod.METHOD_HTTP:
-            cmd_copy = f"copy {HTTP_SERVER}{self.target_image} {self.file_system}/{self.target_image}"
+            cmd_copy = f"copy {self._get_http_url()} {self.file_system}/{self.target_image}"
+        elif self.task.transfer_method == TaskTransferMethod.METHOD_SCP:
+            # pushed by the worker, device does not need to reach any server
+            pass
         else:
             msg = "Unknown transfer method"
             self.error(msg)
@@ -420,9 +496,28 @@ class TaskExecutor(TaskLoggerMixIn):
             self.error(msg)
             self.skip_task(msg, TaskFailReasonChoices.FAIL_UPLOAD)
 
-        self.debug(f"Copy command: {cmd_copy}")
+        if PEER_DISTRIBUTION and self._copy_from_peer():
+            self._rollback_copy_configs(configs_undo)
+            return
+        if self.task.transfer_method == TaskTransferMethod.METHOD_SCP:
+            # image is pushed over a channel of the paramiko SSH session, telnet fallback has none
+            if self.scrapli["transport"] != "paramiko":
+                self._rollback_copy_configs(configs_undo)
+                msg = f"SCP transfer method needs SSH session, device is connected via {self.scrapli['transport']}"
+                self.error(msg)
+                self.skip_task(msg, TaskFailReasonChoices.FAIL_UPLOAD)
+            self._scp_upload()
+            self._rollback_copy_configs(configs_undo)
+            return
+
+        if PEER_DISTRIBUTION:
+            self._check_file_server(configs_undo)
+        # presigned URL signature is not written into task log
+        cmd_copy_log = re.sub(r"\x16\?\S*", "?<signed>", cmd_copy)
+        self.debug(f"Copy command: {cmd_copy_log}")
         self.info(f"Copy in progress...")
 
+        release_db_connections()
         outputs = self._send_commands(
             [cmd_copy],
             timeout_ops=7200,
@@ -435,6 +530,9 @@ class TaskExecutor(TaskLoggerMixIn):
             self.error(msg)
             self.skip_task(msg, TaskFailReasonChoices.FAIL_UPLOAD)
 
+        self._rollback_copy_configs(configs_undo)
+
+    def _rollback_copy_configs(self, configs_undo: list[str]) -> None:
         outputs = self._send_configs(configs_undo)
         self.debug(f"Rollback after copy:\n{outputs.result}")
         if outputs.failed:
@@ -443,12 +541,82 @@ class TaskExecutor(TaskLoggerMixIn):
             self.error(msg)
             self.skip_task(msg, TaskFailReasonChoices.FAIL_UPLOAD)
 
+    def _scp_upload(self) -> None:
+        sw = self.ctx.sw
+        size = self.ctx.image_size
+        remote_path = f"{self.file_system}/{self.target_image}"
+
+        def progress(sent: int, total: int) -> None:
+            self.info(f"SCP progress: {sent * 100 // total}% ({sent} of {total} bytes)")
+            # log write reopens DB connection, it is not kept for the rest of the push
+            release_db_connections()
+
+        self.info(f"SCP push to {remote_path} in progress...")
+        release_db_connections()
+        try:
+            with sw.image.storage.open(sw.image.name, "rb") as source:
+                elapsed = scp_push(self.cli.transport.session, source, size, remote_path, progress=progress)
+        except Exception as e:
+            self._close_cli()
+            msg = f"Can not push image with SCP: {e}"
+            self.error(msg)
+            self.skip_task(msg, TaskFailReasonChoices.FAIL_UPLOAD)
+        self.info(f"SCP push completed in {int(elapsed)}s, {int(size / max(elapsed, 1) / 1024)} KiB/s")
+
+    def _copy_from_peer(self) -> bool:
+        sw = self.ctx.sw
+        for staged in get_peer_candidates(self.task.device, sw):
+            peer_ip = str(staged.device.primary_ip4.address.ip)
+            if not is_ssh_open(peer_ip):
+                self.debug(f"Peer {staged.device} ({peer_ip}) is not reachable")
+                continue
+            with peer_slot(staged.device) as available:
+                if not available:
+                    self.debug(f"Peer {staged.device} is busy")
+                    continue
+                source = f"{staged.file_system}{self.target_image}"
+                self.info(f"Copy from peer {staged.device} ({peer_ip}:{source}) in progress...")
+                release_db_connections()
+                outputs = self._send_commands(
+                    [f"copy scp://{DEVICE_USERNAME}:{DEVICE_PASSWORD}@{peer_ip}/{source} {self.file_system}/{self.target_image}"],
+                    timeout_ops=7200,
+                    timeout_transport=7200,
+                )
+            self.debug(f"Copy logs:\n{outputs.result}")
+            if not outputs.failed and re.search(r"bytes copied in", outputs.result):
+                self.info(f"Image was copied from peer {staged.device}")
+                return True
+            # peer might have removed the image, it is not offered any more
+            self.warning(f"Can not copy image from peer {staged.device}, trying next source")
+            forget_staged(staged.device, sw)
+        return False
+
+    def _check_image_is_published(self) -> None:
+        # presigned URL points to object storage itself, nothing is published for it
+        if self.task.transfer_method == TaskTransferMethod.METHOD_HTTP and not is_local_storage():
+            return
+        sw = self.ctx.sw
+        if unpublished := get_unpublished_servers(sw, self.task.transfer_method):
+            msg = f"Image is not published to file server(s): {', '.join(unpublished)}"
+            self.error(msg)
+            self.skip_task(msg, TaskFailReasonChoices.FAIL_UPLOAD)
+
+    def _get_http_url(self) -> str:
+        if is_local_storage():
+            return f"{HTTP_SERVER}{self.target_image}"
+        # Image is in object storage, device downloads it directly with presigned URL. "?" starts
+        # context help in IOS CLI, it is entered literally after Ctrl-V.
+        url = get_image_url(self.ctx.sw.image.name)
+        return url.replace("?", "\x16?")
+
     def _check_md5(self, filename: str, expected_md5: str) -> None:
-        outputs = self._send_commands(
-            [f"verify /md5 {filename} {expected_md5}"],
-            timeout_ops=1800,
-            timeout_transport=1800,
-        )
+        with self._timed("verify"):
+            release_db_connections()
+            outputs = self._send_commands(
+                [f"verify /md5 {filename} {expected_md5}"],
+                timeout_ops=1800,
+                timeout_transport=1800,
+            )
 
         self.debug(f"MD5 verication result:\n{outputs.result[-150:]}")
         if outputs.failed:
@@ -459,6 +627,9 @@ class TaskExecutor(TaskLoggerMixIn):
 
         if re.search(r"Verified", outputs.result):
             self.info("MD5 was verified")
+            self.image_verified = True
+            if self.task.device is not None and self.file_system:
+                record_staged(self.task.device, self.ctx.sw, self.file_system)
         else:
             self._close_cli()
             msg = "Wrong M5"
@@ -468,7 +639,7 @@ class TaskExecutor(TaskLoggerMixIn):
     def _upload(self) -> None:
         if self.task.device is None:
             return
-        if not self.task.device.device_type.golden_image.sw.image_exists:
+        if not self.ctx.sw.image_exists:
             msg = f"SoftwareImage was created without file, upload is not applicable"
             self.warning(msg)
             self.skip_task(msg, TaskFailReasonChoices.FAIL_UPLOAD)
@@ -477,9 +648,11 @@ class TaskExecutor(TaskLoggerMixIn):
             self.warning(msg)
             self.skip_task(msg, TaskFailReasonChoices.FAIL_UPLOAD)
 
+        if self.task.transfer_method == TaskTransferMethod.METHOD_SCP:
+            self._remove_partial_image()
         if self.image_on_device is not None and len(self.image_on_device) == 0:
             self.info("No image on the device. Need to transfer")
-            image_size = int(self.task.device.device_type.golden_image.sw.image.size) * 1.1
+            image_size = int(self.ctx.image_size) * 1.1
             self.debug(f"Free on {self.file_system} - {self.total_free}, Image size (+10%) - {int(image_size)}")
 
             if int(self.total_free) < int(image_size):
@@ -489,30 +662,48 @@ class TaskExecutor(TaskLoggerMixIn):
                 self.skip_task(msg, TaskFailReasonChoices.FAIL_UPLOAD)
             else:
                 self.debug("Enough space for uploading, contunue proccessing")
-            self._file_upload()
+            self._check_image_is_published()
+            with self._timed("upload"):
+                self._file_upload()
+            self.image_on_device = [{"name": self.target_image}]
         else:
             self.info(f"Image {self.target_image} already exists")
 
         self.info("MD5 verification...")
         self._check_md5(
             filename=f"{self.file_system}/{self.target_image}",
-            expected_md5=self.task.device.device_type.golden_image.sw.md5sum,
+            expected_md5=self.ctx.md5sum,
         )
         self.info("File was uploaded and verified")
-        self._close_cli()
+
+    def _remove_partial_image(self) -> None:
+        # SCP can not append: interrupted push leaves a shorter file which is sent again from scratch,
+        # complete file is kept and only verified
+        if not self.image_on_device:
+            return
+        size = self.ctx.image_size
+        on_box = int(self.image_on_device[0].get("size") or 0)
+        if on_box >= size:
+            return
+        self.warning(f"Partial image on the box ({on_box} of {size} bytes), it will be sent again")
+        outputs = self._send_commands([f"delete /force {self.file_system}/{self.target_image}"])
+        self.debug(f"Delete partial image:\n{outputs.result}")
+        self.total_free = int(self.total_free) + on_box
+        self.image_on_device = []
 
     def _compare_sw(self, show_version_output: Response, should_match: bool) -> None:
         if self.task.device is None:
             return
         show_ver_parsed = show_version_output.textfsm_parse_output()
         sw_current = show_ver_parsed[0].get("version", "N/A")  # type: ignore
-        sw_target = self.task.device.device_type.golden_image.sw.version
+        sw_target = self.ctx.target_version
         self.debug(f"Current version is '{sw_current}'")
         self.debug(f"Target version is '{sw_target}'")
         if self.task.device.custom_field_data[CF_NAME_SW_VERSION] != sw_current:
             self.info("Updating custom field")
             self.task.device.custom_field_data[CF_NAME_SW_VERSION] = sw_current
             self.task.device.save()
+        update_device_compliance(self.task.device, sw_current, sw_target)
         if should_match and sw_current.lower() != sw_target.lower():
             msg = f"Current version '{sw_current}' does not match with target '{sw_target}' after upgrade"
             self.error(msg)
@@ -595,6 +786,7 @@ class TaskExecutor(TaskLoggerMixIn):
         if self.cli is None:
             return
 
+        self.reload_requested = True
         try:
             output = self.cli.send_interactive(
                 [
@@ -614,19 +806,54 @@ class TaskExecutor(TaskLoggerMixIn):
             self.debug("\n" + output.result)  # type: ignore
             self.debug("----------^^ Outputs ^^----------")
 
+    # False only if SNMP shows that device is still up since before reload, True if SNMP is not available
+    def _is_rebooted(self, since: float) -> bool:
+        if (status := poll_device(self.ctx.host)) is None:
+            return True
+        if status.uptime > time.monotonic() - since:
+            self.info(f"SNMP: device has not reloaded yet, uptime {status.uptime}s")
+            return False
+        self.info(f"SNMP: device was booted {status.uptime}s ago, version '{status.version}'")
+        return True
+
+    # Sleeps up to "seconds", with BOOT_EVENTS wakes up as soon as boot event of the device is received
+    def _sleep_or_boot_event(self, seconds: int, since: float) -> None:
+        release_db_connections()
+        if not BOOT_EVENTS or self.boot_event is not None:
+            time.sleep(seconds)
+            return
+        if (event := wait_for_boot(self.ctx.host, since=since, timeout=seconds)) is not None:
+            self.boot_event = event
+            self.info(f"Boot event '{event['event']}' was received {int(event['time'] - since)} seconds after reload")
+
     def _wait_for_device_up(self) -> None:
         hold_timer = 30
+        # boot event only shortens waiting, the budget is the same as for TCP polling
+        deadline = time.monotonic() + hold_timer + UPGRADE_MAX_ATTEMPTS_AFTER_RELOAD * UPGRADE_SECONDS_BETWEEN_ATTEMPTS
+        waiting_since = time.monotonic()
+        reload_time = time.time()
+        self.boot_event = None
+        slow_boot_reported = False
         self.info(f"Hold for {hold_timer} seconds")
-        time.sleep(hold_timer)
-        for try_number in range(1, UPGRADE_MAX_ATTEMPTS_AFTER_RELOAD + 1):
-            self.info(f"Connecting after reload {try_number}/{UPGRADE_MAX_ATTEMPTS_AFTER_RELOAD}...")
-            if not self._is_alive():
-                self.info(f"Device is not online, next try in {UPGRADE_SECONDS_BETWEEN_ATTEMPTS} seconds")
-                time.sleep(UPGRADE_SECONDS_BETWEEN_ATTEMPTS)
-            else:
+        self._sleep_or_boot_event(hold_timer, reload_time)
+        try_number = 0
+        while True:
+            try_number += 1
+            self.info(f"Connecting after reload, try {try_number}...")
+            if self._is_rebooted(waiting_since) and self._is_alive():
                 self.info("Device became online")
                 time.sleep(10)
                 return
+            if BOOT_EVENTS and self.boot_event is None and not slow_boot_reported:
+                if time.monotonic() - waiting_since > BOOT_EVENT_TIMEOUT:
+                    self.warning(f"No boot event in {BOOT_EVENT_TIMEOUT} seconds, device boots slowly or does not send events")
+                    slow_boot_reported = True
+            # after boot event only SSH server has to start, so device is checked more often
+            interval = 10 if self.boot_event is not None else UPGRADE_SECONDS_BETWEEN_ATTEMPTS
+            if time.monotonic() + interval > deadline:
+                break
+            self.info(f"Device is not online, next try in {interval} seconds")
+            self._sleep_or_boot_event(interval, reload_time)
         if not self._is_alive():
             msg = "Device was lost after reload"
             self.error(msg)
@@ -672,7 +899,7 @@ class TaskExecutor(TaskLoggerMixIn):
 
         self._compare_sw(outputs[1], should_match=False)
 
-        if not self.task.device.device_type.golden_image.sw.image_exists:
+        if not self.ctx.sw.image_exists:
             msg = f"SoftwareImage was created without file, upgrade is not applicable"
             self.warning(msg)
             self.skip_task(msg, TaskFailReasonChoices.FAIL_UPGRADE)
@@ -684,28 +911,43 @@ class TaskExecutor(TaskLoggerMixIn):
         else:
             self.info("Image exists on the box")
 
-        self._check_md5(
-            filename=f"{self.file_system}/{self.target_image}",
-            expected_md5=self.task.device.device_type.golden_image.sw.md5sum,
-        )
+        if self.image_verified:
+            self.info("Image was verified in this session, no need to check MD5 again")
+        else:
+            self._check_md5(
+                filename=f"{self.file_system}/{self.target_image}",
+                expected_md5=self.ctx.md5sum,
+            )
         self._check_failure_theshold()
         self._change_bootvar(outputs[0])
         self._write_memory()
-        self._reload_in()
-        self._close_cli()
-        self._wait_for_device_up()
-        self._post_checking()
+        with self._timed("reload"):
+            self._reload_in()
+            self._close_cli()
+            self._wait_for_device_up()
+        with self._timed("post"):
+            self._post_checking()
 
     def execute_task(self) -> bool:
         self.info(f"New Job {self.task.job_id} was started. Type {self.task.task_type}")
-        self._initial_check()
-        self._validate_device()
-
-        if self.task.task_type == TaskTypeChoices.TYPE_UPLOAD:
-            self.info("Upload task")
-            self._upload()
-        elif self.task.task_type == TaskTypeChoices.TYPE_UPGRADE:
-            self.info("Upgrade task")
-            self._upgrade()
+        try:
+            with self._timed("check"):
+                self._initial_check()
+            with self._timed("validate"):
+                self._validate_device()
+
+            if self.task.task_type == TaskTypeChoices.TYPE_UPLOAD:
+                self.info("Upload task")
+                self._upload()
+            elif self.task.task_type == TaskTypeChoices.TYPE_UPGRADE:
+                self.info("Upgrade task")
+                self._upgrade()
+            elif self.task.task_type == TaskTypeChoices.TYPE_UPLOAD_UPGRADE:
+                self.info("Upload and upgrade task")
+                self._upload()
+                self._upgrade()
+        finally:
+            self._close_cli()
+            self._release_device_lock()
 
         return True
@@ -0,0 +1,74 @@
+from unittest import mock
+
+from dcim.models import Device, DeviceRole, DeviceType, Manufacturer, Site
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from software_manager.compliance import refresh_compliance
+from software_manager.models import GoldenImage, SoftwareImage
+from software_manager.views import GoldenImageList
+
+
+class GoldenImageListTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manufacturer = Manufacturer.objects.create(name="Cisco", slug="cisco")
+        cls.site = Site.objects.create(name="Site 1", slug="site-1")
+        cls.role = DeviceRole.objects.create(name="Switch", slug="switch")
+        cls.create_golden_images(0, 2)
+
+    @classmethod
+    def create_golden_images(cls, start: int, count: int) -> None:
+        for i in range(start, start + count):
+            device_type = DeviceType.objects.create(manufacturer=cls.manufacturer, model=f"C9300-{i}", slug=f"c9300-{i}")
+            sw = SoftwareImage.objects.create(version=f"17.3.{i}a")
+            GoldenImage.objects.create(pid=device_type, sw=sw)
+            for j in range(3):
+                Device.objects.create(
+                    name=f"device-{i}-{j}",
+                    device_type=device_type,
+                    device_role=cls.role,
+                    site=cls.site,
+                )
+
+    @classmethod
+    def upgrade_devices(cls, device_type: DeviceType, count: int, version: str) -> None:
+        for device in Device.objects.filter(device_type=device_type).order_by("pk")[:count]:
+            device.custom_field_data["sw_version"] = version
+            device.save()
+        with mock.patch("software_manager.compliance.CF_NAME_SW_VERSION", "sw_version"):
+            refresh_compliance([device_type.pk])
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_superuser(username="admin", password="admin")
+        self.client.force_login(self.user)
+
+    def test_list_query_count_does_not_grow_with_rows(self):
+        url = reverse("plugins:software_manager:goldenimage_list")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        self.create_golden_images(2, 10)
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_progress_is_counted_from_compliance(self):
+        device_type = DeviceType.objects.get(slug="c9300-0")
+        # versions are compared case-insensitively, like compliance filter does
+        self.upgrade_devices(device_type, 2, "17.3.0A")
+
+        row = GoldenImageList.queryset.get(pk=device_type.pk)
+        self.assertEqual(row.instance_total, 3)
+        self.assertEqual(row.instance_upgraded, 2)
+        self.assertEqual(row.progress, 66.67)
+        self.assertEqual(device_type.golden_image.get_progress(), 66.67)
+
+        other = GoldenImageList.queryset.get(slug="c9300-1")
+        self.assertEqual(other.instance_total, 3)
+        self.assertEqual(other.instance_upgraded, 0)
+        self.assertEqual(other.progress, 0)
@@ -0,0 +1,214 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import BinaryIO
+
+import pytz
+from django.conf import settings
+from django.core.files import File
+from django.db import DatabaseError, transaction
+
+from .choices import ImageIntegrityChoices
+from .hashing import HASH_BUFFER_SIZE, get_hashers, hash_file
+from .image_store import attach_blob
+from .models import SoftwareImage, SoftwareImageUpload
+from .storage import get_image_storage, is_local_storage
+
+PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get("software_manager", dict())
+IMAGE_FOLDER = PLUGIN_SETTINGS.get("IMAGE_FOLDER", "")
+UPLOAD_CHUNK_MAX_SIZE = PLUGIN_SETTINGS.get("UPLOAD_CHUNK_MAX_SIZE", 1024 * 1024 * 1024)
+# Uploads without new chunks for N hours are removed by scrub_images together with their .part files
+UPLOAD_STALE_HOURS = PLUGIN_SETTINGS.get("UPLOAD_STALE_HOURS", 24)
+
+# Chunks which arrive in order are hashed while they are written. State lives in the process which
+# received the previous chunk; if chunk goes to another process or out of order (parallel upload),
+# file is hashed once at finalize instead.
+_hash_states: dict[str, tuple[int, dict, float]] = {}
+_hash_lock = threading.Lock()
+
+
+# called under _hash_lock, states of abandoned uploads are dropped
+def _prune_hash_states() -> None:
+    expired = time.monotonic() - UPLOAD_STALE_HOURS * 3600
+    for key in [key for key, state in _hash_states.items() if state[2] < expired]:
+        del _hash_states[key]
+
+
+class UploadError(Exception):
+    def __init__(self, message: str, conflict: bool = False) -> None:
+        super().__init__(message)
+        self.message = message
+        self.conflict = conflict
+
+
+def _merge_range(ranges: list[list[int]], start: int, end: int) -> list[list[int]]:
+    merged: list[list[int]] = []
+    for r_start, r_end in sorted(ranges + [[start, end]]):
+        if merged and r_start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], r_end)
+        else:
+            merged.append([r_start, r_end])
+    return merged
+
+
+def _image_path(filename: str) -> Path:
+    return Path(settings.MEDIA_ROOT, IMAGE_FOLDER, filename)
+
+
+def create_upload(filename: str, size: int, version: str = "", md5sum: str = "") -> SoftwareImageUpload:
+    if Path(filename).name != filename or filename.startswith("."):
+        raise UploadError(f"'{filename}' is not a valid file name")
+    if not filename.lower().endswith(".bin"):
+        raise UploadError("Only .bin images are allowed")
+    if (
+        SoftwareImage.objects.filter(filename__iexact=filename).exists()
+        or SoftwareImageUpload.objects.filter(filename__iexact=filename).exists()
+        or get_image_storage().exists(f"{IMAGE_FOLDER}/{filename}")
+    ):
+        raise UploadError(f"'{filename}' already exists or is being uploaded", conflict=True)
+
+    upload = SoftwareImageUpload.objects.create(filename=filename, size=size, version=version, md5sum=md5sum)
+    upload.part_path.parent.mkdir(parents=True, exist_ok=True)
+    # sparse file of final size, chunks are written in place at their offsets
+    with open(upload.part_path, "wb") as f:
+        f.truncate(size)
+    return upload
+
+
+def write_chunk(upload: SoftwareImageUpload, offset: int, stream: BinaryIO, length: int) -> SoftwareImageUpload:
+    if offset < 0 or length <= 0 or offset + length > upload.size:
+        raise UploadError(f"Chunk {offset}+{length} is outside of upload size {upload.size}")
+    if length > UPLOAD_CHUNK_MAX_SIZE:
+        raise UploadError(f"Chunk is larger than {UPLOAD_CHUNK_MAX_SIZE} bytes")
+
+    key = str(upload.upload_id)
+    with _hash_lock:
+        state = _hash_states.pop(key, None)
+    if state is None and offset == 0:
+        state = (0, get_hashers(), time.monotonic())
+    hashers = state[1] if state is not None and state[0] == offset else None
+
+    written = 0
+    with open(upload.part_path, "r+b") as f:
+        f.seek(offset)
+        while written < length:
+            data = stream.read(min(HASH_BUFFER_SIZE, length - written))
+            if not data:
+                break
+            f.write(data)
+            if hashers is not None:
+                for hasher in hashers.values():
+                    hasher.update(data)
+            written += len(data)
+    if written != length:
+        # client disconnected, written part is not recorded and has to be sent again
+        raise UploadError(f"Expected {length} bytes, received {written}")
+
+    if hashers is not None:
+        with _hash_lock:
+            _prune_hash_states()
+            _hash_states[key] = (offset + written, hashers, time.monotonic())
+
+    # parallel chunks of the same upload are recorded one by one
+    with transaction.atomic():
+        upload = SoftwareImageUpload.objects.select_for_update().get(pk=upload.pk)
+        upload.received = _merge_range(upload.received, offset, offset + written)
+        upload.save(update_fields=["received", "last_updated"])
+    return upload
+
+
+# Upload row is locked for the whole finalize, concurrent finalize of the same upload gets conflict
+def finalize_upload(upload: SoftwareImageUpload) -> SoftwareImage:
+    with transaction.atomic():
+        try:
+            upload = SoftwareImageUpload.objects.select_for_update(nowait=True).filter(pk=upload.pk).first()
+        except DatabaseError:
+            raise UploadError("Upload is being finalized by another request", conflict=True)
+        if upload is None:
+            raise UploadError("Upload was already finalized or aborted", conflict=True)
+        return _finalize_locked(upload)
+
+
+def _finalize_locked(upload: SoftwareImageUpload) -> SoftwareImage:
+    if not upload.is_complete:
+        raise UploadError(f"Upload is incomplete: {upload.offset} of {upload.size} bytes", conflict=True)
+
+    with _hash_lock:
+        state = _hash_states.pop(str(upload.upload_id), None)
+    if state is not None and state[0] == upload.size:
+        hashes = {name: hasher.hexdigest() for name, hasher in state[1].items()}
+    else:
+        hashes = hash_file(upload.part_path)
+    if upload.md5sum and upload.md5sum.lower() != hashes["md5"]:
+        raise UploadError(f"MD5 mismatch: expected {upload.md5sum}, calculated {hashes['md5']}")
+
+    name = f"{IMAGE_FOLDER}/{upload.filename}"
+    storage = get_image_storage()
+    if storage.exists(name):
+        raise UploadError(f"'{upload.filename}' already exists", conflict=True)
+    if is_local_storage():
+        os.rename(upload.part_path, _image_path(upload.filename))
+    else:
+        # chunks are staged locally, object storage gets the assembled file in a multipart upload
+        with open(upload.part_path, "rb") as f:
+            storage.save(name, File(f))
+
+    try:
+        sw = SoftwareImage(
+            image=name,
+            version=upload.version,
+            md5sum=upload.md5sum,
+            integrity_status=ImageIntegrityChoices.INTEGRITY_OK,
+        )
+        sw._set_hashes(hashes)
+        attach_blob(sw)
+        sw._set_fingerprint(sw._stat_image())
+        if not is_local_storage():
+            sw.image_size = upload.size
+        sw.save()
+        upload.delete()
+    except Exception:
+        # transaction is rolled back and upload row stays, file goes back to .part so finalize can be retried
+        if is_local_storage():
+            os.rename(_image_path(upload.filename), upload.part_path)
+        else:
+            storage.delete(name)
+        raise
+    if not is_local_storage():
+        part_path = upload.part_path
+        transaction.on_commit(lambda: part_path.unlink(missing_ok=True))
+    return sw
+
+
+def abort_upload(upload: SoftwareImageUpload) -> None:
+    with _hash_lock:
+        _hash_states.pop(str(upload.upload_id), None)
+    upload.part_path.unlink(missing_ok=True)
+    upload.delete()
+
+
+# Removes uploads abandoned by clients and .part files which have no upload record (worker crash)
+def cleanup_stale_uploads(hours: int = UPLOAD_STALE_HOURS) -> int:
+    cutoff = datetime.now().astimezone(pytz.utc) - timedelta(hours=int(hours))
+    removed = 0
+    for upload in SoftwareImageUpload.objects.filter(last_updated__lt=cutoff):
+        with transaction.atomic():
+            # skipped if the upload is being finalized right now
+            try:
+                locked = SoftwareImageUpload.objects.select_for_update(nowait=True).filter(pk=upload.pk).first()
+            except DatabaseError:
+                continue
+            if locked is not None:
+                abort_upload(locked)
+                removed += 1
+
+    known = {upload.part_path.name for upload in SoftwareImageUpload.objects.all()}
+    image_dir = Path(settings.MEDIA_ROOT, IMAGE_FOLDER)
+    if image_dir.is_dir():
+        for part in image_dir.glob(".upload-*.part"):
+            if part.name not in known and part.stat().st_mtime < cutoff.timestamp():
+                part.unlink(missing_ok=True)
+                removed += 1
+    return removed
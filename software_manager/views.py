@@ -1,20 +1,24 @@
 from copy import deepcopy
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import pytz
 from dcim.models import Device, DeviceType
 from django.conf import settings
 from django.contrib import messages
 from django.core.handlers.wsgi import WSGIRequest
+from django.db.models import Count, FloatField, Q
+from django.db.models.functions import Cast, NullIf, Round
 from django.http import HttpResponse, HttpResponseRedirect
 from django.shortcuts import redirect, render
 from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.utils.timezone import localtime
 from django.views import View
-from django_rq import get_queue
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from netbox.views.generic import BulkDeleteView, ObjectDeleteView, ObjectEditView, ObjectListView, ObjectView
 
-from .choices import TaskStatusChoices
-from .filtersets import GoldenImageFilterSet, ScheduledTaskFilterSet, SoftwareImageFilterSet
+from .choices import ImageIntegrityChoices, TaskStatusChoices, TaskTypeChoices
+from .filtersets import GoldenImageFilterSet, ScheduledTaskFilterSet, SoftwareImageFilterSet, UpgradeDeviceFilterSet
 from .forms import (
     GoldenImageAddForm,
     GoldenImageFilterForm,
@@ -22,8 +26,12 @@ from .forms import (
     ScheduledTaskFilterForm,
     SoftwareImageEditForm,
     SoftwareImageFilterForm,
+    UpgradeDeviceFilterForm,
 )
+from .hashing import HashingFileUploadHandler
 from .models import GoldenImage, ScheduledTask, SoftwareImage
+from .queues import get_task_queue
+from .scheduler import BatchPlan, coalesce_tasks, get_job_timeout, plan_batch
 from .tables import (
     GoldenImageListTable,
     ScheduledTaskBulkDeleteTable,
@@ -35,7 +43,6 @@ from .tables import (
 
 PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get("software_manager", dict())
 CF_NAME_SW_VERSION = PLUGIN_SETTINGS.get("CF_NAME_SW_VERSION", "")
-UPGRADE_QUEUE = PLUGIN_SETTINGS.get("UPGRADE_QUEUE", "")
 
 ########################################################################
 #                          SoftwareImage
@@ -54,7 +61,16 @@ class SoftwareImageList(ObjectListView):
     actions = ("add", "bulk_delete")
 
 
-class SoftwareImageAdd(ObjectEditView):
+@method_decorator(csrf_exempt, name="dispatch")
+class HashingUploadMixin:
+    # Upload handlers have to be replaced before request body is parsed, CSRF middleware parses it
+    # for POST requests. So CSRF check is postponed until the handler is installed.
+    def dispatch(self, request, *args, **kwargs):
+        request.upload_handlers.insert(0, HashingFileUploadHandler(request))
+        return csrf_protect(super().dispatch)(request, *args, **kwargs)
+
+
+class SoftwareImageAdd(HashingUploadMixin, ObjectEditView):
     queryset = SoftwareImage.objects.all()
     form = SoftwareImageEditForm
 
@@ -62,7 +78,7 @@ class SoftwareImageAdd(ObjectEditView):
         return reverse("plugins:software_manager:softwareimage_list")
 
 
-class SoftwareImageEdit(ObjectEditView):
+class SoftwareImageEdit(HashingUploadMixin, ObjectEditView):
     queryset = SoftwareImage.objects.all()
     form = SoftwareImageEditForm
 
@@ -85,7 +101,24 @@ class SoftwareImageBulkDelete(BulkDeleteView):
 
 
 class GoldenImageList(ObjectListView):
-    queryset = DeviceType.objects.all()
+    # progress of every row is calculated in one grouped query instead of 3 counts per row
+    queryset = (
+        DeviceType.objects.select_related("manufacturer", "golden_image__sw")
+        .annotate(
+            instance_total=Count("instances", distinct=True),
+            instance_upgraded=Count(
+                "instances",
+                filter=Q(instances__compliance__compliant=True),
+                distinct=True,
+            ),
+        )
+        .annotate(
+            progress=Round(
+                Cast("instance_upgraded", FloatField()) * 100 / NullIf("instance_total", 0),
+                2,
+            ),
+        )
+    )
     table = GoldenImageListTable
     filterset = GoldenImageFilterSet
     filterset_form = GoldenImageFilterForm
@@ -155,21 +188,73 @@ class GoldenImageDelete(ObjectDeleteView):
 
 
 class UpgradeDeviceList(ObjectListView):
+    # single-valued relations in one JOIN query, target version included
     queryset = (
-        Device.objects.all()
-        .prefetch_related(
+        Device.objects.select_related(
             "primary_ip4",
             "tenant",
-            "device_type",
-            "device_type__golden_image",
+            "device_role",
+            "device_type__manufacturer",
+            "compliance",
         )
+        .prefetch_related("tags")
         .order_by("name")
     )
     actions = ()
     table = UpgradeDeviceListTable
+    filterset = UpgradeDeviceFilterSet
+    filterset_form = UpgradeDeviceFilterForm
     template_name = "software_manager/upgradedevice_list.html"
 
 
+def enqueue_plan(request: WSGIRequest, plan: BatchPlan, task_type: str, data: dict, start_now: bool) -> None:
+    queue = get_task_queue(task_type)
+
+    for position, planned in enumerate(plan.tasks):
+        task = ScheduledTask(
+            device=planned.device,
+            task_type=task_type,
+            scheduled_time=data["scheduled_time"],
+            mw_duration=int(data["mw_duration"]),
+            status=TaskStatusChoices.STATUS_SCHEDULED,
+            user=request.user.username,  # type: ignore
+            transfer_method=data["transfer_method"],
+            estimated_duration=planned.estimate,
+        )
+        task.save()
+
+        queue_args = {
+            "f": "software_manager.worker.upgrade_device",
+            "job_timeout": get_job_timeout(planned.estimate, data["mw_duration"]),
+            "args": [task.pk],
+        }
+        if start_now:
+            job = queue.enqueue(**queue_args)
+        else:
+            # RQ scheduler keeps time with 1 second resolution, so tasks are shifted by 1 second
+            # to be moved into the queue in planned order.
+            job = queue.enqueue_at(
+                datetime=data["scheduled_time"] + timedelta(seconds=position),
+                **queue_args,
+            )
+
+        task.job_id = job.id
+        task.save()
+
+    finish = localtime(data["scheduled_time"] + timedelta(seconds=plan.makespan))
+    messages.info(
+        request,
+        f"Forecast for {task_type}: {len(plan.tasks)} tasks on {plan.workers} worker(s), "
+        f"expected completion at {finish.strftime('%Y-%m-%d %H:%M')}",
+    )
+    if plan.overflow:
+        messages.warning(
+            request,
+            f"{len(plan.overflow)} {task_type} task(s) are not expected to be completed "
+            f"inside {data['mw_duration']} hours MW",
+        )
+
+
 def submit_tasks(request: WSGIRequest) -> HttpResponseRedirect:
     filled_form = ScheduledTaskCreateForm(request.POST)
     if not filled_form.is_valid():
@@ -194,37 +279,53 @@ def submit_tasks(request: WSGIRequest) -> HttpResponseRedirect:
     else:
         start_now = None
 
-    for device in data["pk"]:
-        if start_now is not None:
-            data["scheduled_time"] = start_now
-
-        task = ScheduledTask(
-            device=device,
-            task_type=data["task_type"],
-            scheduled_time=data["scheduled_time"],
-            mw_duration=int(data["mw_duration"]),
-            status=TaskStatusChoices.STATUS_SCHEDULED,
-            user=request.user.username,  # type: ignore
-            transfer_method=data["transfer_method"],
+    if start_now is not None:
+        data["scheduled_time"] = start_now
+
+    devices = list(data["pk"])
+    if data["task_type"] != TaskTypeChoices.TYPE_UPGRADE:
+        # image is copied from file server, corrupted image must not reach devices
+        corrupted_pks = set(
+            Device.objects.filter(
+                pk__in=[d.pk for d in devices],
+                device_type__golden_image__sw__integrity_status__in=(
+                    ImageIntegrityChoices.INTEGRITY_MISMATCH,
+                    ImageIntegrityChoices.INTEGRITY_MISSING,
+                ),
+            ).values_list("pk", flat=True)
         )
-        task.save()
-
-        queue = get_queue(UPGRADE_QUEUE)
-        queue_args = {
-            "f": "software_manager.worker.upgrade_device",
-            "job_timeout": 3600,
-            "args": [task.pk],
-        }
-        if start_now is not None:
-            job = queue.enqueue(**queue_args)
-        else:
-            job = queue.enqueue_at(
-                datetime=data["scheduled_time"],
-                **queue_args,
+        corrupted = [d for d in devices if d.pk in corrupted_pks]
+        if corrupted:
+            messages.error(
+                request,
+                f"Golden image integrity check failed, tasks were not created for {len(corrupted)} device(s): "
+                f"{', '.join(str(d) for d in corrupted)}",
             )
+            devices = [d for d in devices if d not in corrupted]
 
-        task.job_id = job.id
-        task.save()
+    batches, duplicates, coalesced = coalesce_tasks(
+        devices=devices,
+        task_type=data["task_type"],
+        scheduled_time=data["scheduled_time"],
+        mw_duration=data["mw_duration"],
+    )
+    if duplicates:
+        messages.warning(
+            request,
+            f"{len(duplicates)} device(s) already have the same task scheduled in this MW: "
+            f"{', '.join(str(d) for d in duplicates)}",
+        )
+    if coalesced:
+        messages.info(request, f"{len(coalesced)} scheduled task(s) were coalesced with new upload+upgrade tasks")
+
+    for task_type, devices in batches.items():
+        plan = plan_batch(
+            devices=devices,
+            task_type=task_type,
+            transfer_method=data["transfer_method"],
+            mw_duration=data["mw_duration"],
+        )
+        enqueue_plan(request, plan, task_type, data, start_now is not None)
 
     return redirect(
         to=reverse("plugins:software_manager:scheduledtask_list"),
@@ -244,7 +345,9 @@ class UpgradeDeviceScheduler(View):
             else:
                 device_list = []
 
-            selected_devices = Device.objects.filter(pk__in=device_list)
+            selected_devices = Device.objects.filter(pk__in=device_list).select_related(
+                "tenant", "device_role", "device_type", "compliance"
+            )
 
             if not selected_devices:
                 if "_tasks" in request.POST:
@@ -272,7 +375,8 @@ class UpgradeDeviceScheduler(View):
 
 
 class ScheduledTaskList(ObjectListView):
-    queryset = ScheduledTask.objects.all()
+    # log can be hundreds of KB per task and is shown on task page only
+    queryset = ScheduledTask.objects.select_related("device").defer("log")
     table = ScheduledTaskTable
     filterset = ScheduledTaskFilterSet
     filterset_form = ScheduledTaskFilterForm
@@ -302,6 +406,6 @@ class ScheduledTaskDelete(ObjectDeleteView):
 
 
 class ScheduledTaskBulkDelete(BulkDeleteView):
-    queryset = ScheduledTask.objects.all()
+    queryset = ScheduledTask.objects.select_related("device").defer("log")
     table = ScheduledTaskBulkDeleteTable
     default_return_url = "plugins:software_manager:scheduledtask_list"
@@ -3,10 +3,13 @@ from datetime import datetime
 import pytz
 from django.conf import settings
 from django.db.models import Count
-from django_rq import get_queue, job
+from django_rq import job
 
 from .choices import TaskStatusChoices
+from .context import load_task
 from .models import ScheduledTask
+from .queues import get_task_queue
+from .scheduler import schedule_retry
 from .task_exceptions import TaskException
 from .task_executor import TaskExecutor
 
@@ -17,7 +20,7 @@ UPGRADE_QUEUE = PLUGIN_SETTINGS.get("UPGRADE_QUEUE", "")
 @job(UPGRADE_QUEUE)
 def upgrade_device(task_id):
     def add_summary(status):
-        queue = get_queue(UPGRADE_QUEUE)
+        queue = get_task_queue(task.task_type)
         total = ScheduledTask.objects.filter(scheduled_time=task.scheduled_time).count()
         field = "status"
         stats = (
@@ -34,25 +37,30 @@ def upgrade_device(task_id):
         executor.info(f"Summary: {overall}")
         if queue.count == 0:
             if queue.started_job_registry.count == 1:
-                executor.info("All tasks have been completed.")
+                executor.info(f"All tasks in '{queue.name}' queue have been completed.")
             else:
-                executor.info("No queued tasks were remained")
+                executor.info(f"No queued tasks were remained in '{queue.name}' queue")
         else:
-            executor.info(f"Remained task: {queue.count}. Taking the next one.")
+            executor.info(f"Remained task in '{queue.name}' queue: {queue.count}. Taking the next one.")
 
     try:
-        task = ScheduledTask.objects.get(id=task_id)
+        task = load_task(task_id)
     except Exception:
         raise
 
     task.start_time = datetime.now().replace(microsecond=0).astimezone(pytz.utc)
     task.status = TaskStatusChoices.STATUS_RUNNING
+    task.attempts += 1
     task.save()
 
     executor = TaskExecutor(task)
     try:
         executor.execute_task()
     except TaskException as exc:
+        if exc.retryable and (delay := schedule_retry(task)) is not None:
+            executor.warning(f"Transient failure on attempt {task.attempts}, task is retried in {delay} seconds")
+            add_summary(task.status)
+            return f"Task will be retried. {exc.reason}: {exc.message}"
         if task.status == TaskStatusChoices.STATUS_SKIPPED:
             task.end_time = datetime.now().replace(microsecond=0).astimezone(pytz.utc)
             task.confirmed = True